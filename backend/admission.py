@@ -0,0 +1,108 @@
+# Admission control - per-session rate limiting and a global cap on in-flight profile writes
+
+import math
+import time
+from collections import OrderedDict
+
+from metrics import ADMISSION_IN_FLIGHT_WRITES, ADMISSION_REJECTED
+
+
+class SessionRateLimiter:
+    """
+    Token bucket per key, refilling `rate` tokens per second up to `burst`.
+
+    Each bucket is stored as a single float, the time at which it will be full again
+    (the generic cell rate algorithm), in an OrderedDict kept in least recently used order.
+    A bucket past that time is the same as a missing one, so expired buckets are dropped
+    from the old end as new ones arrive, and the dict never holds more than `max_keys`
+    buckets; evicting a bucket early can only let its key through sooner.
+    """
+
+    def __init__(self, rate, burst, max_keys=100000, clock=time.monotonic):
+        self._interval = 1.0 / rate
+        self._tolerance = (burst - 1) * self._interval
+        self._max_keys = max_keys
+        self._clock = clock
+        self._full_at = OrderedDict()  # key -> time the bucket is full again
+
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+        self._rejected = ADMISSION_REJECTED.labels("session_rate")
+
+    def acquire(self, key):
+        """
+        Take a token for `key`. Returns 0 when one was available, otherwise the seconds
+        until the next one will be.
+        """
+        now = self._clock()
+        full_at = max(self._full_at.get(key, now), now)
+        wait = full_at - now - self._tolerance
+        if wait > 0:
+            self.rejected += 1
+            self._rejected.inc()
+            return wait
+
+        self.allowed += 1
+        self._full_at[key] = full_at + self._interval
+        self._full_at.move_to_end(key)
+        self._expire(now)
+        return 0.0
+
+    def _expire(self, now):
+        buckets = self._full_at
+        while buckets:
+            key, full_at = next(iter(buckets.items()))
+            if full_at > now and len(buckets) <= self._max_keys:
+                break
+            if full_at > now:
+                self.evicted += 1
+            del buckets[key]
+
+    def stats(self):
+        return {
+            'ratePerSecond': 1.0 / self._interval,
+            'burst': round(self._tolerance / self._interval) + 1,
+            'trackedSessions': len(self._full_at),
+            'allowed': self.allowed,
+            'rejected': self.rejected,
+            'evicted': self.evicted
+        }
+
+
+class WriteLimiter:
+    """
+    Non-blocking cap on concurrent profile writes: try_acquire() fails at once when
+    `limit` writes are in flight, instead of queueing more work behind the pool
+    """
+
+    def __init__(self, limit):
+        self._limit = limit
+        self._in_flight = 0
+
+        self.rejected = 0
+        self._rejected = ADMISSION_REJECTED.labels("write_concurrency")
+        self._gauge = ADMISSION_IN_FLIGHT_WRITES.labels()
+
+    def try_acquire(self):
+        if self._in_flight >= self._limit:
+            self.rejected += 1
+            self._rejected.inc()
+            return False
+        self._in_flight += 1
+        self._gauge.inc()
+        return True
+
+    def release(self):
+        self._in_flight -= 1
+        self._gauge.dec()
+
+    def stats(self):
+        return {'limit': self._limit, 'inFlight': self._in_flight, 'rejected': self.rejected}
+
+
+def retry_after(seconds):
+    """
+    Retry-After header value for a wait in seconds, at least one second
+    """
+    return str(max(1, math.ceil(seconds)))
@@ -0,0 +1,251 @@
+# Analytics rollups - incrementally maintained profile counts for the analytics dashboard
+
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from pymongo import UpdateOne
+
+from energy_codec import energy_array, energy_values
+from profile_generator import (
+    CHAKRA_KEYS, DOMINANT_NAMES, LEVEL_NAMES, LEVEL_THRESHOLDS, analyze_energy_centers, analyze_energy_values
+)
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = "profile_rollups"
+
+# Packed profiles read per batch when a rebuild counts them in Python
+REBUILD_BATCH_SIZE = 1000
+
+# Rolled-up dimensions besides the hourly buckets
+DIMENSIONS = ("dominantChakra", "overallLevel", "mostBlocked", "combination")
+HOUR = "hour"
+
+
+def _hour(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def _rollup_id(dimension, value):
+    if dimension == HOUR:
+        value = value.strftime("%Y-%m-%dT%H")
+    return f"{dimension}|{value}"
+
+
+def _combination(dominant_chakra, most_blocked):
+    return f"{dominant_chakra}|{most_blocked}"
+
+
+def _count_features(documents, increments):
+    """
+    Add the rollup increments of the given profile documents to `increments`,
+    a dict of rollup _id -> (dimension, value, {field: amount})
+    """
+    if len(documents) == 1:
+        # A single save skips the array path, which costs more than the arithmetic for one row
+        rows = [analyze_energy_values(energy_values(documents[0]["energyCenters"]))]
+    else:
+        features = analyze_energy_centers(np.stack([energy_array(document["energyCenters"]) for document in documents]))
+        rows = zip(*(column.tolist() for column in features))
+
+    def bump(dimension, value, field="count"):
+        key = _rollup_id(dimension, value)
+        counts = increments.setdefault(key, (dimension, value, {}))[2]
+        counts[field] = counts.get(field, 0) + 1
+
+    for document, (_, level_index, dominant_index, most_blocked_index, _) in zip(documents, rows):
+        dominant_chakra = DOMINANT_NAMES[dominant_index]
+        most_blocked = CHAKRA_KEYS[most_blocked_index]
+        bump("dominantChakra", dominant_chakra)
+        bump("overallLevel", LEVEL_NAMES[level_index])
+        bump("mostBlocked", most_blocked)
+        bump("combination", _combination(dominant_chakra, most_blocked))
+
+        hour = _hour(document["createdAt"])
+        bump(HOUR, hour)
+        bump(HOUR, hour, f"dominantChakra.{dominant_chakra}")
+
+
+def rollup_updates(documents):
+    """
+    One merged $inc upsert per rollup bucket touched by the given profile documents
+    """
+    if not documents:
+        return []
+    increments = {}
+    _count_features(documents, increments)
+    return [
+        UpdateOne(
+            {"_id": key},
+            {"$inc": counts, "$setOnInsert": {"dimension": dimension, "value": value}},
+            upsert=True
+        )
+        for key, (dimension, value, counts) in increments.items()
+    ]
+
+
+async def read_analytics(db, hours=24):
+    """
+    Dashboard view built from the rollup documents only, O(number of buckets)
+    """
+    totals = {dimension: {} for dimension in DIMENSIONS}
+    async for rollup in db[ROLLUP_COLLECTION].find({"dimension": {"$in": list(DIMENSIONS)}}):
+        totals[rollup["dimension"]][rollup["value"]] = rollup.get("count", 0)
+
+    since = _hour(datetime.utcnow()) - timedelta(hours=hours - 1)
+    hourly = [
+        {"hour": rollup["value"], "count": rollup.get("count", 0), "dominantChakra": rollup.get("dominantChakra", {})}
+        async for rollup in db[ROLLUP_COLLECTION].find({"dimension": HOUR, "value": {"$gte": since}}).sort("value", 1)
+    ]
+
+    combinations = sorted(
+        (
+            {"dominantChakra": value.split("|")[0], "mostBlocked": value.split("|")[1], "count": count}
+            for value, count in totals.pop("combination").items()
+        ),
+        key=lambda combination: -combination["count"]
+    )
+
+    return {**totals, "combinations": combinations, "hourly": hourly}
+
+
+def _rebuild_pipeline():
+    """
+    Recompute every rollup from the document-encoded profiles in energy_profiles, deriving
+    the features from energyCenters with the same rules as analyze_energy_centers
+    """
+    def field_values(field):
+        return [f"$energyCenters.{key}.{field}" for key in CHAKRA_KEYS]
+
+    count = len(CHAKRA_KEYS)
+    average = {
+        field: {"$divide": [{"$add": field_values(field)}, count]}
+        for field in ("frequency", "balance", "blockage")
+    }
+    scores = [
+        {"$subtract": [{"$add": [f"$energyCenters.{key}.frequency", f"$energyCenters.{key}.balance"]},
+                       f"$energyCenters.{key}.blockage"]}
+        for key in CHAKRA_KEYS
+    ]
+    level_branches = [
+        {"case": {"$gte": ["$level", threshold]}, "then": name}
+        for threshold, name in zip(LEVEL_THRESHOLDS, LEVEL_NAMES)
+    ]
+
+    def group_count(field):
+        return [{"$group": {"_id": field, "count": {"$sum": 1}}}]
+
+    return [
+        # Packed values can't be read by the aggregation, rebuild_rollups counts those itself
+        {"$match": {"energyCenters": {"$type": "object"}}},
+        {"$project": {
+            "_id": 0,
+            "hour": {"$dateTrunc": {"date": "$createdAt", "unit": "hour"}},
+            "scores": scores,
+            "blockages": field_values("blockage"),
+            "level": {"$divide": [
+                {"$subtract": [{"$add": [average["frequency"], average["balance"]]}, average["blockage"]]}, 2
+            ]}
+        }},
+        {"$project": {
+            "hour": 1,
+            "overallLevel": {"$switch": {"branches": level_branches, "default": LEVEL_NAMES[-1]}},
+            "dominantChakra": {"$cond": [
+                {"$gt": [{"$max": "$scores"}, 0]},
+                {"$arrayElemAt": [list(DOMINANT_NAMES), {"$indexOfArray": ["$scores", {"$max": "$scores"}]}]},
+                DOMINANT_NAMES[0]
+            ]},
+            "mostBlocked": {"$arrayElemAt": [list(CHAKRA_KEYS), {"$indexOfArray": ["$blockages", {"$max": "$blockages"}]}]}
+        }},
+        {"$facet": {
+            "dominantChakra": group_count("$dominantChakra"),
+            "overallLevel": group_count("$overallLevel"),
+            "mostBlocked": group_count("$mostBlocked"),
+            "combination": group_count({"$concat": ["$dominantChakra", "|", "$mostBlocked"]}),
+            HOUR: group_count({"hour": "$hour", "dominantChakra": "$dominantChakra"})
+        }}
+    ]
+
+
+async def rebuild_rollups(db):
+    """
+    Recompute the rollups from the full profile history and swap them in atomically.
+    Profiles saved while the rebuild runs are not counted, so run it when traffic is quiet.
+    """
+    facets = await db.energy_profiles.aggregate(_rebuild_pipeline(), allowDiskUse=True).to_list(1)
+    facets = facets[0] if facets else {}
+
+    rollups = {}
+    for dimension in DIMENSIONS:
+        for group in facets.get(dimension, []):
+            rollups[_rollup_id(dimension, group["_id"])] = {
+                "dimension": dimension, "value": group["_id"], "count": group["count"]
+            }
+    for group in facets.get(HOUR, []):
+        hour, dominant_chakra = group["_id"]["hour"], group["_id"]["dominantChakra"]
+        rollup = rollups.setdefault(_rollup_id(HOUR, hour), {"dimension": HOUR, "value": hour, "count": 0, "dominantChakra": {}})
+        rollup["count"] += group["count"]
+        rollup["dominantChakra"][dominant_chakra] = group["count"]
+
+    # Profiles stored packed go through the same feature analysis as new saves
+    increments = {}
+    batch = []
+    async for document in db.energy_profiles.find(
+        {"energyCenters": {"$type": "binData"}}, {"energyCenters": 1, "createdAt": 1}, batch_size=REBUILD_BATCH_SIZE
+    ):
+        batch.append(document)
+        if len(batch) >= REBUILD_BATCH_SIZE:
+            _count_features(batch, increments)
+            batch = []
+    if batch:
+        _count_features(batch, increments)
+    for key, (dimension, value, counts) in increments.items():
+        rollup = rollups.setdefault(key, {"dimension": dimension, "value": value, "count": 0})
+        for field, amount in counts.items():
+            if field == "count":
+                rollup["count"] += amount
+            else:
+                dominant_chakra = field.split(".", 1)[1]
+                chakras = rollup.setdefault("dominantChakra", {})
+                chakras[dominant_chakra] = chakras.get(dominant_chakra, 0) + amount
+
+    staging = db[f"{ROLLUP_COLLECTION}_rebuild"]
+    await staging.drop()
+    if rollups:
+        await staging.insert_many([{"_id": key, **rollup} for key, rollup in rollups.items()])
+        await staging.create_index([("dimension", 1), ("value", 1)], name="dimension_value")
+        await staging.rename(ROLLUP_COLLECTION, dropTarget=True)
+    else:
+        await db[ROLLUP_COLLECTION].delete_many({})
+    return len(rollups)
+
+
+def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Maintain the profile analytics rollups")
+    parser.add_argument("command", choices=["rebuild"], help="rebuild: recompute all rollups from energy_profiles")
+    parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            count = await rebuild_rollups(client[os.environ['DB_NAME']])
+            logger.info(f"Rebuilt {count} rollup documents")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
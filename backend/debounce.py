@@ -0,0 +1,141 @@
+# Save debouncer - coalesces bursts of profile saves per session into the settled state
+
+import asyncio
+import logging
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+
+class SaveDebouncer:
+    """
+    Trailing-edge debounce of profile saves keyed by sessionId.
+
+    Every submit replaces the session's pending document and restarts its timer, so only
+    the state that stays unchanged for `window` seconds is handed to `sink` (an async
+    callable taking a list of documents and returning the error message of every document
+    that failed, keyed by position). A burst is never held back longer than
+    `max_wait` seconds. All documents of a burst share one profile id, so any id returned
+    to the client resolves to the settled state once it is stored.
+    """
+
+    def __init__(self, sink, window=1.0, max_wait=10.0):
+        self._sink = sink
+        self._window = window
+        self._max_wait = max_wait
+        self._pending = {}  # sessionId -> [document, timer, first submit time]
+        self._pending_ids = {}  # profile id -> sessionId, until its save finished
+        self._saving = {}  # sessionId -> task saving its latest settled state
+
+        self.submitted = 0
+        self.coalesced = 0
+        self.saved = 0
+        self.failed = 0
+
+    def submit(self, document):
+        """
+        Make `document` the pending state of its session and return its profile id
+        """
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        session_id = document["sessionId"]
+        pending = self._pending.get(session_id)
+
+        self.submitted += 1
+        if pending is not None:
+            _, timer, first_submitted = pending
+            timer.cancel()
+            document["_id"] = pending[0]["_id"]
+            self.coalesced += 1
+        else:
+            first_submitted = now
+            document["_id"] = ObjectId()
+            self._pending_ids[document["_id"]] = session_id
+
+        delay = max(0.0, min(self._window, first_submitted + self._max_wait - now))
+        timer = loop.call_later(delay, self._settle, session_id)
+        self._pending[session_id] = [document, timer, first_submitted]
+        return document["_id"]
+
+    def _take(self, session_id):
+        pending = self._pending.pop(session_id, None)
+        if pending is None:
+            return None
+        document, timer, _ = pending
+        timer.cancel()
+        return document
+
+    def _settle(self, session_id):
+        document = self._take(session_id)
+        if document is not None:
+            self._start_save(session_id, document)
+
+    def _start_save(self, session_id, document):
+        # Saves of a session run one after the other, so its latest task covers all of them
+        previous = self._saving.get(session_id)
+        task = asyncio.get_running_loop().create_task(self._save([document], previous))
+        self._saving[session_id] = task
+        task.add_done_callback(lambda done: self._saving.pop(session_id, None)
+                               if self._saving.get(session_id) is done else None)
+        return task
+
+    async def _save(self, documents, previous=None):
+        if previous is not None:
+            await previous
+        try:
+            await self._write(documents)
+        finally:
+            for document in documents:
+                self._pending_ids.pop(document["_id"], None)
+
+    async def _write(self, documents):
+        try:
+            write_errors = await self._sink(documents) or {}
+        except Exception as e:
+            self.failed += len(documents)
+            logger.error(f"Error saving {len(documents)} debounced profiles: {str(e)}")
+            return
+        self.saved += len(documents) - len(write_errors)
+        self.failed += len(write_errors)
+        for position, message in write_errors.items():
+            logger.error(f"Error saving debounced profile {documents[position]['_id']}: {message}")
+
+    async def flush_session(self, session_id):
+        """
+        Store the session's pending state now and wait for its settled saves still in
+        flight, so reads see the latest profile
+        """
+        document = self._take(session_id)
+        if document is not None:
+            self._start_save(session_id, document)
+        saving = self._saving.get(session_id)
+        if saving is not None:
+            # Shielded, a cancelled read must not cancel the save
+            await asyncio.shield(saving)
+
+    async def flush_profile(self, profile_id):
+        session_id = self._pending_ids.get(profile_id)
+        if session_id is not None:
+            await self.flush_session(session_id)
+
+    async def flush_all(self):
+        """
+        Store every pending state and wait for in-flight saves, used on shutdown
+        """
+        documents = [self._take(session_id) for session_id in list(self._pending)]
+        if documents:
+            await self._save(documents)
+        if self._saving:
+            await asyncio.gather(*self._saving.values(), return_exceptions=True)
+
+    def stats(self):
+        return {
+            'windowSeconds': self._window,
+            'maxWaitSeconds': self._max_wait,
+            'pendingSessions': len(self._pending),
+            'submitted': self.submitted,
+            'coalesced': self.coalesced,
+            'saved': self.saved,
+            'failed': self.failed
+        }
@@ -0,0 +1,291 @@
+# Energy codec - storage encodings of profile documents (packed energyCenters, inputs-only
+# profiles), with migration and size report tools
+
+import argparse
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+import bson
+import numpy as np
+from bson import Binary
+from pymongo import UpdateOne
+
+from profile_generator import (
+    CHAKRA_KEYS, ENERGY_FIELDS, RULE_VERSION, array_to_energy_centers, energy_centers_to_array, energy_centers_to_values,
+    lookup_profile_dicts, values_to_energy_centers
+)
+
+logger = logging.getLogger(__name__)
+
+# How new profiles store energyCenters: "document" (nested sub-documents) or "packed" (binary)
+ENERGY_STORAGE = os.environ.get('ENERGY_STORAGE', 'document').lower()
+
+# What new profiles store: "full" (inputs and generatedProfile) or "inputs" (generatedProfile is
+# rebuilt from energyCenters on read, always with the current rules)
+PROFILE_STORAGE = os.environ.get('PROFILE_STORAGE', 'full').lower()
+
+# Layout of a packed value: one version byte, then the 21 values as bytes in CHAKRA_KEYS x ENERGY_FIELDS order
+PACKED_VERSION = 1
+VALUE_COUNT = len(CHAKRA_KEYS) * len(ENERGY_FIELDS)
+PACKED_SIZE = 1 + VALUE_COUNT
+
+# Fields stored for the unique indexes behind repeated save detection, never returned by the API
+STORAGE_ONLY_FIELDS = ("dedupKey", "idempotencyKey")
+
+# Documents read and rewritten per round trip by the migration
+MIGRATE_BATCH_SIZE = int(os.environ.get('MIGRATE_BATCH_SIZE', '1000'))
+
+
+def pack_values(values) -> Binary:
+    """
+    Packed binary value for 21 values (a list or an array of any shape) in CHAKRA_KEYS x ENERGY_FIELDS order
+    """
+    return Binary(bytes([PACKED_VERSION]) + np.asarray(values, dtype=np.uint8).tobytes())
+
+
+def unpack_values(data) -> np.ndarray:
+    """
+    (7, 3) uint8 array of a packed value
+    """
+    if len(data) != PACKED_SIZE or data[0] != PACKED_VERSION:
+        raise ValueError(f"Unsupported packed energyCenters value ({len(data)} bytes, version {data[:1].hex()})")
+    return np.frombuffer(data, dtype=np.uint8, offset=1).reshape(len(CHAKRA_KEYS), len(ENERGY_FIELDS))
+
+
+def stored_energy_centers(values):
+    """
+    The energyCenters value a new profile is stored with, per ENERGY_STORAGE, for 21 values
+    given as a flat list or a (7, 3) array
+    """
+    if ENERGY_STORAGE == "packed":
+        return pack_values(values)
+    if isinstance(values, np.ndarray):
+        return array_to_energy_centers(values.reshape(len(CHAKRA_KEYS), len(ENERGY_FIELDS)))
+    return values_to_energy_centers(values)
+
+
+def stores_generated_profiles():
+    return PROFILE_STORAGE != "inputs"
+
+
+def stored_profile(session_id, values, generated_profile, now):
+    """
+    New profile document in the configured storage encodings; `values` as for stored_energy_centers.
+    `generated_profile` may be None when stores_generated_profiles() is false.
+    """
+    document = {"sessionId": session_id, "energyCenters": stored_energy_centers(values)}
+    if stores_generated_profiles():
+        document["generatedProfile"] = generated_profile
+    document["ruleVersion"] = RULE_VERSION
+    document["createdAt"] = now
+    document["updatedAt"] = now
+    return document
+
+
+def energy_array(stored) -> np.ndarray:
+    """
+    (7, 3) uint8 array of a stored energyCenters value in either encoding
+    """
+    if isinstance(stored, bytes):
+        return unpack_values(stored)
+    return energy_centers_to_array(stored)
+
+
+def energy_values(stored):
+    """
+    The 21 values of a stored energyCenters value in either encoding, as a list in
+    CHAKRA_KEYS x ENERGY_FIELDS order; cheaper than energy_array for a single document
+    """
+    if isinstance(stored, bytes):
+        return unpack_values(stored).ravel().tolist()
+    return energy_centers_to_values(stored)
+
+
+def _selects_generated(projection):
+    return projection is None or any(
+        path == "generatedProfile" or path.startswith("generatedProfile.") for path in projection
+    )
+
+
+def read_projection(projection):
+    """
+    The projection to query with for documents decoded by decode_profiles(documents, projection):
+    rebuilding generatedProfile needs energyCenters
+    """
+    if projection is None or not _selects_generated(projection) or "energyCenters" in projection:
+        return projection
+    return {**projection, "energyCenters": 1}
+
+
+def _project_generated(profile, projection):
+    if projection is None or "generatedProfile" in projection:
+        return profile
+    parts = [path.split(".", 1)[1] for path in projection if path.startswith("generatedProfile.")]
+    return {part: profile[part] for part in parts if part in profile}
+
+
+def decode_profiles(documents, projection=None):
+    """
+    Bring stored profile documents to the API shape: packed energyCenters are decoded to the
+    dict shape, inputs-only profiles get generatedProfile (and ruleVersion) from the
+    memoized generator and STORAGE_ONLY_FIELDS are dropped. `projection` is the one the documents were requested with; pass
+    read_projection(projection) to the query.
+    """
+    rebuild = []
+    for document in documents:
+        for field in STORAGE_ONLY_FIELDS:
+            document.pop(field, None)
+        stored = document.get("energyCenters")
+        if stored is None:
+            continue
+        values = energy_array(stored) if isinstance(stored, bytes) else None
+        if values is not None:
+            document["energyCenters"] = array_to_energy_centers(values)
+        if "generatedProfile" not in document and _selects_generated(projection):
+            rebuild.append((document, values if values is not None else energy_array(stored)))
+
+    decoded = {}
+    if rebuild:
+        profiles = lookup_profile_dicts(np.stack([values for _, values in rebuild]))
+        for (document, _), profile in zip(rebuild, profiles):
+            # generatedProfile goes right after energyCenters, where full documents keep it
+            fields = {}
+            for key, value in document.items():
+                fields[key] = value
+                if key == "energyCenters":
+                    fields["generatedProfile"] = _project_generated(profile, projection)
+            if "ruleVersion" in fields:
+                fields["ruleVersion"] = RULE_VERSION
+            decoded[id(document)] = fields
+
+    requested_centers = projection is None or "energyCenters" in projection
+    result = []
+    for document in documents:
+        document = decoded.get(id(document), document)
+        if not requested_centers:
+            document.pop("energyCenters", None)
+        result.append(document)
+    return result
+
+
+def decode_profile(document):
+    """
+    decode_profiles for a single, unprojected document
+    """
+    return decode_profiles([document])[0]
+
+
+async def migrate(collection, to="packed", batch_size=MIGRATE_BATCH_SIZE):
+    """
+    Rewrite every profile's energyCenters into the `to` encoding ("packed" or "document").
+    Walks in _id order and only selects documents still in the other encoding, so an
+    interrupted run can simply be started again.
+    """
+    source_type = "object" if to == "packed" else "binData"
+    converted = failed = 0
+    last_id = None
+    while True:
+        query = {"energyCenters": {"$type": source_type}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, {"energyCenters": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        updates = []
+        for document in batch:
+            try:
+                values = energy_array(document["energyCenters"])
+            except (KeyError, TypeError, ValueError, OverflowError) as e:
+                failed += 1
+                logger.error(f"Skipping profile {document['_id']} with unreadable energyCenters: {str(e)}")
+                continue
+            stored = pack_values(values) if to == "packed" else array_to_energy_centers(values)
+            # Matching the old value keeps a concurrent writer's change from being overwritten
+            updates.append(UpdateOne(
+                {"_id": document["_id"], "energyCenters": document["energyCenters"]},
+                {"$set": {"energyCenters": stored}}
+            ))
+        if updates:
+            result = await collection.bulk_write(updates, ordered=False)
+            converted += result.modified_count
+        logger.info(f"Migrated up to _id {last_id}: {converted} converted, {failed} failed")
+
+    return {"converted": converted, "failed": failed}
+
+
+async def size_report(db):
+    """
+    Profile counts and average BSON sizes per energyCenters encoding, the collection's data
+    and storage sizes, and the savings still available from packing document-encoded profiles
+    """
+    groups = await db.energy_profiles.aggregate([
+        {"$group": {
+            "_id": {"$type": "$energyCenters"},
+            "count": {"$sum": 1},
+            "avgDocumentBytes": {"$avg": {"$bsonSize": "$$ROOT"}},
+            "totalDocumentBytes": {"$sum": {"$bsonSize": "$$ROOT"}}
+        }}
+    ], allowDiskUse=True).to_list(None)
+    stats = await db.command("collStats", "energy_profiles")
+
+    # Per-document difference between the two encodings; field values don't change the BSON size
+    zeros = np.zeros(VALUE_COUNT, dtype=np.uint8)
+    saving = (
+        len(bson.encode({"energyCenters": values_to_energy_centers(zeros.tolist())}))
+        - len(bson.encode({"energyCenters": pack_values(zeros)}))
+    )
+    unpacked = sum(group["count"] for group in groups if group["_id"] == "object")
+
+    return {
+        "encodings": {
+            {"object": "document", "binData": "packed"}.get(group["_id"], group["_id"]): {
+                "count": group["count"],
+                "avgDocumentBytes": round(group["avgDocumentBytes"], 1),
+                "totalDocumentBytes": group["totalDocumentBytes"]
+            }
+            for group in groups
+        },
+        "dataBytes": stats.get("size"),
+        "storageBytes": stats.get("storageSize"),
+        "indexBytes": stats.get("totalIndexSize"),
+        "savingPerDocumentBytes": saving,
+        "remainingSavingBytes": saving * unpacked
+    }
+
+
+def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from fast_json import encode_document
+
+    parser = argparse.ArgumentParser(description="Convert and measure the energyCenters storage encoding")
+    parser.add_argument("command", choices=["migrate", "report"],
+                        help="migrate: rewrite stored profiles into one encoding; report: print storage sizes")
+    parser.add_argument("--to", choices=["packed", "document"], default="packed", help="target encoding of migrate")
+    parser.add_argument("--batch-size", type=int, default=MIGRATE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            db = client[os.environ['DB_NAME']]
+            if args.command == "migrate":
+                logger.info(f"Migration finished: {await migrate(db.energy_profiles, args.to, args.batch_size)}")
+            else:
+                print(encode_document(await size_report(db)).decode())
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
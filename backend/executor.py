@@ -0,0 +1,106 @@
+# Generation executor - runs CPU-bound profile work inline or in a process pool, by batch size
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from metrics import EXECUTOR_PENDING, EXECUTOR_QUEUE_WAIT, EXECUTOR_REJECTED, EXECUTOR_RUN_DURATION
+from profile_generator import CHAKRA_KEYS, ENERGY_FIELDS, generate_spiritual_profiles
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorBusy(Exception):
+    """
+    Raised when pool work could not get a slot before the queue timeout expired
+    """
+
+
+def _warm_up():
+    # Importing profile_generator compiled the rules; one generation warms numpy as well
+    generate_spiritual_profiles(np.zeros((1, len(CHAKRA_KEYS), len(ENERGY_FIELDS)), dtype=np.uint8))
+    return multiprocessing.current_process().pid
+
+
+class GenerationExecutor:
+    """
+    Runs `func(values)` for an (N, 7, 3) values array inline when N is at most `inline_max`,
+    and in a pool of `workers` processes otherwise, so large batches don't stall the event loop.
+
+    At most `max_pending` pool calls are submitted at once; further calls wait up to
+    `queue_timeout` seconds for a slot and then raise ExecutorBusy. With `workers` set to 0
+    everything runs inline. `func` must be a module-level function so it can be pickled, and
+    as workers are spawned, scripts starting a pool need an `if __name__ == "__main__"` guard.
+    """
+
+    def __init__(self, workers=0, inline_max=256, max_pending=None, queue_timeout=1.0):
+        self._workers = workers
+        self._inline_max = inline_max
+        self._max_pending = max_pending or 2 * workers
+        self._queue_timeout = queue_timeout
+        self._pool = None
+        self._slots = None
+
+        self._inline_time = EXECUTOR_RUN_DURATION.labels("inline")
+        self._pool_time = EXECUTOR_RUN_DURATION.labels("pool")
+        self._queue_wait = EXECUTOR_QUEUE_WAIT.labels()
+        self._pending = EXECUTOR_PENDING.labels()
+        self._rejected = EXECUTOR_REJECTED.labels()
+
+    @property
+    def running(self):
+        return self._pool is not None
+
+    async def start(self):
+        """
+        Start the worker processes and wait until each has generated a profile
+        """
+        if self._workers <= 0 or self.running:
+            return
+        started = time.perf_counter()
+        # spawn rather than fork, the parent holds an event loop and Mongo client threads
+        self._pool = ProcessPoolExecutor(max_workers=self._workers, mp_context=multiprocessing.get_context("spawn"))
+        self._slots = asyncio.Semaphore(self._max_pending)
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(loop.run_in_executor(self._pool, _warm_up) for _ in range(self._workers)))
+        logger.info(
+            f"Started {len(set(pids))} generation worker processes in {time.perf_counter() - started:.2f}s"
+        )
+
+    async def stop(self):
+        if not self.running:
+            return
+        pool, self._pool = self._pool, None
+        # Waiting for in-flight work would block the loop, so shut down from a thread
+        await asyncio.get_running_loop().run_in_executor(None, pool.shutdown)
+
+    async def run(self, func, values):
+        if not self.running or len(values) <= self._inline_max:
+            started = time.perf_counter()
+            try:
+                return func(values)
+            finally:
+                self._inline_time.observe(time.perf_counter() - started)
+
+        queued = time.perf_counter()
+        self._pending.inc()
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self._queue_timeout)
+            except asyncio.TimeoutError:
+                self._rejected.inc()
+                raise ExecutorBusy(f'All {self._max_pending} generation slots are busy')
+
+            started = time.perf_counter()
+            self._queue_wait.observe(started - queued)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._pool, func, values)
+            finally:
+                self._slots.release()
+                self._pool_time.observe(time.perf_counter() - started)
+        finally:
+            self._pending.dec()
@@ -0,0 +1,201 @@
+# Profile export - streams energy_profiles as NDJSON, CSV or Parquet in constant memory
+
+import argparse
+import asyncio
+import csv
+import io
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from energy_codec import decode_profiles
+from fast_json import encode_document
+from profile_generator import CHAKRA_KEYS, ENERGY_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# Documents fetched per cursor batch and written per output chunk
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+
+FORMATS = ("ndjson", "csv", "parquet")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Flat columns of the CSV and Parquet exports; generatedProfile texts are left out since
+# they follow from the energy values and ruleVersion
+ENERGY_COLUMNS = tuple(f"{key}_{field}" for key in CHAKRA_KEYS for field in ENERGY_FIELDS)
+COLUMNS = (
+    "_id", "sessionId", "createdAt", "updatedAt", "ruleVersion",
+    *ENERGY_COLUMNS,
+    "overallLevel", "overallBalance", "dominantChakra"
+)
+
+
+def export_query(session_id=None, start=None, end=None):
+    """
+    Filter and sort for an export: one session in creation order, or the whole collection by _id.
+    Both sorts follow an index, so the cursor streams without an in-memory sort.
+    """
+    query = {}
+    if session_id:
+        query["sessionId"] = session_id
+    if start or end:
+        query["createdAt"] = {}
+        if start:
+            query["createdAt"]["$gte"] = start
+        if end:
+            query["createdAt"]["$lt"] = end
+    sort = [("createdAt", 1), ("_id", 1)] if session_id else [("_id", 1)]
+    return query, sort
+
+
+def flatten_profile(document):
+    """
+    One export row for a profile document
+    """
+    energy_centers = document.get("energyCenters", {})
+    generated = document.get("generatedProfile", {})
+    row = {
+        "_id": str(document["_id"]),
+        "sessionId": document.get("sessionId"),
+        "createdAt": document.get("createdAt"),
+        "updatedAt": document.get("updatedAt"),
+        "ruleVersion": document.get("ruleVersion"),
+    }
+    for key in CHAKRA_KEYS:
+        center = energy_centers.get(key, {})
+        for field in ENERGY_FIELDS:
+            row[f"{key}_{field}"] = center.get(field)
+    row["overallLevel"] = generated.get("overallLevel")
+    row["overallBalance"] = generated.get("overallBalance")
+    row["dominantChakra"] = generated.get("dominantChakra")
+    return row
+
+
+async def iter_batches(collection, session_id=None, start=None, end=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield lists of at most `batch_size` documents in the full stored shape (see decode_profiles);
+    only one batch is held at a time
+    """
+    query, sort = export_query(session_id, start, end)
+    batch = []
+    async for document in collection.find(query, batch_size=batch_size).sort(sort):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield decode_profiles(batch)
+            batch = []
+    if batch:
+        yield decode_profiles(batch)
+
+
+async def iter_ndjson(batches):
+    async for batch in batches:
+        yield b"".join(encode_document(document) + b"\n" for document in batch)
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+async def iter_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    async for batch in batches:
+        for document in batch:
+            row = flatten_profile(document)
+            writer.writerow([_csv_value(row[column]) for column in COLUMNS])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _parquet_schema(pa):
+    return pa.schema(
+        [
+            ("_id", pa.string()),
+            ("sessionId", pa.string()),
+            ("createdAt", pa.timestamp("ms")),
+            ("updatedAt", pa.timestamp("ms")),
+            ("ruleVersion", pa.string()),
+        ]
+        + [(column, pa.uint8()) for column in ENERGY_COLUMNS]
+        + [
+            ("overallLevel", pa.string()),
+            ("overallBalance", pa.int16()),
+            ("dominantChakra", pa.string()),
+        ]
+    )
+
+
+async def write_parquet(batches, sink):
+    """
+    Write the batches to `sink` (a path or binary file) as Parquet, one row group per batch.
+    Needs the optional pyarrow package.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = _parquet_schema(pa)
+    rows = 0
+    with pq.ParquetWriter(sink, schema) as writer:
+        async for batch in batches:
+            writer.write_table(pa.Table.from_pylist([flatten_profile(document) for document in batch], schema=schema))
+            rows += len(batch)
+    return rows
+
+
+def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Export energy_profiles as NDJSON, CSV or Parquet")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--session", help="only export this sessionId")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="createdAt from (inclusive, ISO 8601, UTC)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="createdAt until (exclusive, ISO 8601, UTC)")
+    parser.add_argument("--output", type=Path, help="output file (default stdout, required for parquet)")
+    args = parser.parse_args()
+    if args.format == "parquet" and args.output is None:
+        parser.error("--output is required for parquet")
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            batches = iter_batches(client[os.environ['DB_NAME']].energy_profiles, args.session, args.start, args.end)
+            if args.format == "parquet":
+                rows = await write_parquet(batches, str(args.output))
+                logger.info(f"Exported {rows} profiles to {args.output}")
+                return
+            chunks = iter_ndjson(batches) if args.format == "ndjson" else iter_csv(batches)
+            output = args.output.open("wb") if args.output else sys.stdout.buffer
+            try:
+                async for chunk in chunks:
+                    output.write(chunk)
+            finally:
+                if args.output:
+                    output.close()
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Fast ingest - parses profile request bodies without building the nested request models
+
+import time
+from typing import List, NamedTuple, Optional
+
+import orjson
+from fastapi.routing import APIRoute
+
+from metrics import REQUEST_VALIDATION, InstrumentedRoute
+from profile_generator import CHAKRA_KEYS, ENERGY_FIELDS
+
+MIN_VALUE = 0
+MAX_VALUE = 100
+
+
+class ParsedProfileRequest(NamedTuple):
+    session_id: Optional[str]
+    values: List[int]  # 21 values in CHAKRA_KEYS x ENERGY_FIELDS order
+
+
+def parse_profile_request(body: bytes) -> Optional[ParsedProfileRequest]:
+    """
+    Decode a POST /api/profiles body and validate it in one pass.
+    Returns None for anything but a well-formed request with integer values in range,
+    leaving the error response to the regular ProfileRequest validation.
+    """
+    try:
+        payload = orjson.loads(body)
+        energy_centers = payload["energyCenters"]
+        session_id = payload.get("sessionId")
+        values = [energy_centers[key][field] for key in CHAKRA_KEYS for field in ENERGY_FIELDS]
+    except (orjson.JSONDecodeError, KeyError, TypeError, AttributeError):
+        return None
+
+    if session_id is not None and type(session_id) is not str:
+        return None
+    for value in values:
+        # bool is an int subclass, and floats or numeric strings are left to the model's coercion
+        if type(value) is not int or not MIN_VALUE <= value <= MAX_VALUE:
+            return None
+    return ParsedProfileRequest(session_id, values)
+
+
+def fast_body(parser, endpoint):
+    """
+    Mark a route endpoint as having a fast path: when `parser` accepts the raw body,
+    `endpoint` is awaited with its result and the request instead of running the regular
+    body validation
+    """
+    def decorate(func):
+        func.fast_body = (parser, endpoint)
+        return func
+    return decorate
+
+
+def _is_json(content_type: Optional[str]) -> bool:
+    if content_type is None:
+        return True
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return media_type == "application/json" or (media_type.startswith("application/") and media_type.endswith("+json"))
+
+
+class FastBodyRoute(APIRoute):
+    """
+    APIRoute offering the raw JSON body to the endpoint's fast_body parser first.
+    Bodies the parser rejects go through FastAPI's regular validation, so error responses are unchanged.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        fast = getattr(self.endpoint, "fast_body", None)
+        if fast is None:
+            return handler
+
+        parser, endpoint = fast
+        validation = REQUEST_VALIDATION.labels(",".join(sorted(self.methods or ())), self.path)
+
+        async def fast_body_handler(request):
+            if _is_json(request.headers.get("content-type")):
+                started = time.perf_counter()
+                # The body is cached on the request, so the fallback handler doesn't read it again
+                parsed = parser(await request.body())
+                if parsed is not None:
+                    validation.observe(time.perf_counter() - started)
+                    return await endpoint(parsed, request)
+            return await handler(request)
+
+        return fast_body_handler
+
+
+class InstrumentedFastBodyRoute(InstrumentedRoute, FastBodyRoute):
+    """
+    FastBodyRoute inside InstrumentedRoute, so fast path requests are measured like any other
+    """
@@ -0,0 +1,40 @@
+# Fast JSON - orjson encoding of API responses, Mongo documents included
+
+import os
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+# Encode responses with orjson; false falls back to jsonable_encoder + json.dumps
+ORJSON_RESPONSES = os.environ.get('ORJSON_RESPONSES', 'true').lower() == 'true'
+
+
+def _default(value):
+    # datetimes are native to orjson, ObjectId is the only other type our documents hold
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def encode_document(content) -> bytes:
+    """
+    orjson encoding of a Mongo document or any content holding one
+    """
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse encoding Mongo documents (datetime and ObjectId values) directly with orjson.
+
+    The output is byte-identical to JSONResponse(jsonable_encoder(content)) for the API's
+    documents; floats that Python prints in exponent notation (1e-05) are written as
+    0.00001 by orjson.
+    """
+
+    def render(self, content) -> bytes:
+        if ORJSON_RESPONSES:
+            return encode_document(content)
+        return super().render(jsonable_encoder(content, custom_encoder={ObjectId: str}))
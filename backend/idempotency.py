@@ -0,0 +1,133 @@
+# Idempotency - replays the response of a repeated profile save instead of storing it again
+
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+# A session saving the same values again, with no other save in between, within this many seconds
+# gets the first save back (0 disables)
+DEDUP_WINDOW_SECONDS = int(os.environ.get('DEDUP_WINDOW_SECONDS', '300'))
+
+# How long an Idempotency-Key is remembered in process
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_SECONDS', '86400'))
+
+# Saves remembered in process, least recently used ones are dropped first
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', '100000'))
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyConflict(Exception):
+    """
+    Raised when an Idempotency-Key is reused for different energy values
+    """
+
+
+class SavedProfile(NamedTuple):
+    session_id: str
+    profile_id: str
+    profile_json: bytes  # shared with the compiled profile cache
+    fingerprint: str
+
+
+def input_fingerprint(values) -> str:
+    """
+    Exact, compact identity of 21 energy values (each 0-100, so one byte apiece)
+    """
+    return bytes(values).hex()
+
+
+def dedup_key(session_id, fingerprint, previous_profile_id, now, window=DEDUP_WINDOW_SECONDS) -> str:
+    """
+    Stored dedupKey of a profile: the session, its values, the id of the session's save before
+    them (None when unknown) and the window-sized time slot the save falls in, so the unique
+    index only rejects consecutive repeats within the same slot
+    """
+    return f"{session_id}|{fingerprint}|{previous_profile_id or ''}|{int(now.timestamp() // window)}"
+
+
+class SaveCache:
+    """
+    In-process record of recent saves, keyed by Idempotency-Key and by sessionId (its latest
+    save). Entries expire after their TTL, and at most `max_entries` are kept in LRU order.
+    """
+
+    def __init__(self, window=DEDUP_WINDOW_SECONDS, key_ttl=IDEMPOTENCY_KEY_TTL_SECONDS,
+                 max_entries=IDEMPOTENCY_CACHE_SIZE, clock=time.monotonic):
+        self._window = window
+        self._key_ttl = key_ttl
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # cache key -> (expires at, SavedProfile)
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def dedup_enabled(self):
+        return self._window > 0
+
+    def _get(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def lookup(self, idempotency_key: Optional[str], session_id: Optional[str], fingerprint: str,
+               by_input=True) -> Optional[SavedProfile]:
+        """
+        The earlier save this one repeats, if any. Raises IdempotencyConflict when the
+        Idempotency-Key was used for other values. Without a key match, only the session's
+        latest save can be repeated; `by_input=False` only matches the key.
+        """
+        now = self._clock()
+        saved = None
+        if idempotency_key is not None:
+            saved = self._get(("key", idempotency_key), now)
+            if saved is not None and saved.fingerprint != fingerprint:
+                raise IdempotencyConflict(idempotency_key)
+        if saved is None and by_input and session_id and self.dedup_enabled:
+            last = self._get(("last", session_id), now)
+            if last is not None and last.fingerprint == fingerprint:
+                saved = last
+
+        if saved is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return saved
+
+    def last_save(self, session_id: str) -> Optional[SavedProfile]:
+        """
+        The session's latest save this process remembers
+        """
+        return self._get(("last", session_id), self._clock())
+
+    def remember(self, idempotency_key: Optional[str], saved: SavedProfile, by_input=True):
+        now = self._clock()
+        entries = self._entries
+        if idempotency_key is not None:
+            entries[("key", idempotency_key)] = (now + self._key_ttl, saved)
+            entries.move_to_end(("key", idempotency_key))
+        if by_input and self.dedup_enabled:
+            key = ("last", saved.session_id)
+            last = self._get(key, now)
+            # A consecutive repeat keeps pointing at the first save of the run
+            if last is None or last.fingerprint != saved.fingerprint:
+                entries[key] = (now + self._window, saved)
+                entries.move_to_end(key)
+        while len(entries) > self._max_entries:
+            entries.popitem(last=False)
+
+    def stats(self):
+        return {
+            'windowSeconds': self._window,
+            'keyTtlSeconds': self._key_ttl,
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses
+        }
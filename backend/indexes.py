@@ -0,0 +1,131 @@
+# Index bootstrap - declares the indexes the API relies on and verifies the routes' query plans
+
+import logging
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Every index the API needs, per collection. Add new ones here together with their queries below.
+INDEXES = {
+    "energy_profiles": [
+        IndexModel([("sessionId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+                   name="sessionId_createdAt_id"),
+        # Repeated saves; only directly written profiles carry these keys
+        IndexModel([("idempotencyKey", ASCENDING)], name="idempotencyKey_unique", unique=True,
+                   partialFilterExpression={"idempotencyKey": {"$exists": True}}),
+        IndexModel([("dedupKey", ASCENDING)], name="dedupKey_unique", unique=True,
+                   partialFilterExpression={"dedupKey": {"$exists": True}}),
+    ],
+    "sessions": [
+        IndexModel([("sessionId", ASCENDING)], name="sessionId_unique", unique=True),
+    ],
+    "profile_rollups": [
+        IndexModel([("dimension", ASCENDING), ("value", ASCENDING)], name="dimension_value"),
+    ],
+}
+
+# Indexes superseded by the ones above, dropped at startup if they still exist
+OBSOLETE_INDEXES = {
+    "energy_profiles": ["sessionId_createdAt"],
+}
+
+# Canonical query of each route: (description, collection, filter, sort, limit)
+CANONICAL_QUERIES = [
+    ("GET /api/profiles/{session_id}", "energy_profiles",
+     {"sessionId": ""}, [("createdAt", DESCENDING), ("_id", DESCENDING)], 51),
+    ("GET /api/profiles/profile/{profile_id}", "energy_profiles",
+     {"_id": ObjectId()}, None, 1),
+    ("GET /api/sessions/{session_id}/stats", "sessions",
+     {"sessionId": ""}, None, 1),
+    ("POST /api/profiles session upsert", "sessions",
+     {"sessionId": ""}, None, 1),
+    ("POST /api/profiles repeated Idempotency-Key", "energy_profiles",
+     {"idempotencyKey": ""}, None, 1),
+    ("POST /api/profiles repeated values", "energy_profiles",
+     {"dedupKey": ""}, None, 1),
+    ("GET /api/analytics hourly buckets", "profile_rollups",
+     {"dimension": "hour", "value": {"$gte": datetime(2000, 1, 1)}}, [("value", ASCENDING)], 0),
+]
+
+
+class QueryPlanError(RuntimeError):
+    """
+    Raised at startup when a canonical query is not backed by an index
+    """
+
+
+def _plan_stages(plan):
+    """
+    Collect every stage name of an explain() plan tree
+    """
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+
+async def ensure_indexes(db):
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped obsolete index {name} on {collection}")
+
+    for collection, models in INDEXES.items():
+        names = await db[collection].create_indexes(models)
+        logger.info(f"Ensured indexes on {collection}: {', '.join(names)}")
+
+
+async def find_collection_scans(db):
+    """
+    Explain every canonical query and return (description, stages) for those using a COLLSCAN
+    """
+    problems = []
+    for description, collection, query, sort, limit in CANONICAL_QUERIES:
+        cursor = db[collection].find(query).limit(limit)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        stages = _plan_stages(explanation.get("queryPlanner", {}).get("winningPlan", {}))
+        if "COLLSCAN" in stages:
+            problems.append((description, stages))
+    return problems
+
+
+async def bootstrap_indexes(db, plan_check="warn"):
+    """
+    Ensure the declared indexes exist, then check the query plans.
+    plan_check is "warn" to log unindexed queries, "fail" to raise QueryPlanError, or "off".
+    """
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Error ensuring indexes: {str(e)}")
+        if plan_check == "fail":
+            raise
+
+    if plan_check == "off":
+        return
+
+    try:
+        problems = await find_collection_scans(db)
+    except Exception as e:
+        logger.error(f"Error explaining canonical queries: {str(e)}")
+        if plan_check == "fail":
+            raise
+        return
+
+    for description, stages in problems:
+        logger.warning(f"Query plan for {description} is a collection scan: {' <- '.join(stages)}")
+    if problems and plan_check == "fail":
+        raise QueryPlanError(f"Unindexed queries: {', '.join(description for description, _ in problems)}")
@@ -0,0 +1,96 @@
+# Live preview - energy center state of a WebSocket preview connection, updated by partial messages
+
+from typing import Optional
+
+import orjson
+
+from fast_ingest import MAX_VALUE, MIN_VALUE, ParsedProfileRequest
+from profile_generator import CHAKRA_KEYS, ENERGY_FIELDS
+
+# Position of each value in the 21-value CHAKRA_KEYS x ENERGY_FIELDS order
+_POSITIONS = {
+    (key, field): index * len(ENERGY_FIELDS) + offset
+    for index, key in enumerate(CHAKRA_KEYS)
+    for offset, field in enumerate(ENERGY_FIELDS)
+}
+
+
+class PreviewError(ValueError):
+    """
+    A preview message that can't be applied; the connection stays open
+    """
+
+
+class PreviewState:
+    """
+    The values a preview connection has sent so far. Updates may carry any subset of
+    energyCenters and are applied all or nothing.
+    """
+
+    def __init__(self, session_id: Optional[str] = None):
+        self.session_id = session_id
+        self.values = [None] * len(_POSITIONS)
+
+    def update(self, energy_centers):
+        if not isinstance(energy_centers, dict):
+            raise PreviewError("energyCenters must be an object")
+        changes = []
+        for key, center in energy_centers.items():
+            if not isinstance(center, dict):
+                raise PreviewError(f"energyCenters.{key} must be an object")
+            for field, value in center.items():
+                position = _POSITIONS.get((key, field))
+                if position is None:
+                    raise PreviewError(f"Unknown energy center value energyCenters.{key}.{field}")
+                if type(value) is not int or not MIN_VALUE <= value <= MAX_VALUE:
+                    raise PreviewError(f"energyCenters.{key}.{field} must be an integer from {MIN_VALUE} to {MAX_VALUE}")
+                changes.append((position, value))
+        for position, value in changes:
+            self.values[position] = value
+
+    @property
+    def missing(self):
+        return [f"{key}.{field}" for (key, field), position in _POSITIONS.items() if self.values[position] is None]
+
+    def request(self) -> ParsedProfileRequest:
+        """
+        The current state as a profile request; raises PreviewError until every value was sent
+        """
+        missing = self.missing
+        if missing:
+            raise PreviewError(f"energyCenters is incomplete, missing {', '.join(missing)}")
+        return ParsedProfileRequest(self.session_id, list(self.values))
+
+
+def parse_message(text):
+    """
+    Decode a client message into a dict with a string `type`
+    """
+    try:
+        message = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        raise PreviewError("Messages must be JSON objects")
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise PreviewError("Messages must be JSON objects with a type")
+    return message
+
+
+def reply(message_type, seq=None, **fields) -> bytes:
+    """
+    Encoded server message; `seq` echoes the client message it answers
+    """
+    content = {"type": message_type}
+    if seq is not None:
+        content["seq"] = seq
+    content.update(fields)
+    return orjson.dumps(content)
+
+
+def splice_reply(message_type, seq, body: bytes) -> bytes:
+    """
+    Server message carrying the fields of an already encoded JSON object `body` as well
+    """
+    head = reply(message_type, seq)
+    if body == b"{}":
+        return head
+    return head[:-1] + b"," + body[1:]
@@ -0,0 +1,387 @@
+# Metrics - Prometheus text exposition of request, generation and MongoDB timings
+
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.routing import APIRoute
+from pymongo import monitoring
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram; observe() only bumps preallocated counters
+    """
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricFamily:
+    """
+    A named metric with fixed label names. Children are created once per label combination;
+    hot paths should resolve them up front with labels() and keep the reference.
+    """
+
+    def __init__(self, kind, name, documentation, labelnames=(), child_factory=None):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._child_factory = child_factory or {"counter": Counter, "gauge": Gauge, "histogram": Histogram}[kind]
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._child_factory())
+        return child
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            if self.kind == "histogram":
+                cumulative = 0
+                for bound, count in zip((*child.buckets, float("inf")), child.counts):
+                    cumulative += count
+                    le = f'le="{_format_value(float(bound))}"'
+                    yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+                yield f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(child.sum)}"
+                yield f"{self.name}_count{_format_labels(self.labelnames, values)} {child.count}"
+            else:
+                yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class CallbackMetric:
+    """
+    Metric whose values are read from `callback` at scrape time, either a number or a
+    dict mapping label value tuples to numbers
+    """
+
+    def __init__(self, kind, name, documentation, callback, labelnames=()):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._callback = callback
+
+    def samples(self):
+        values = self._callback()
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for label_values, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, label_values)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(MetricFamily("counter", name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(MetricFamily("gauge", name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(MetricFamily(
+            "histogram", name, documentation, labelnames, child_factory=functools.partial(Histogram, buckets)
+        ))
+
+    def callback(self, kind, name, documentation, callback, labelnames=()):
+        return self._register(CallbackMetric(kind, name, documentation, callback, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time spent handling a request, by route", ("method", "route"))
+REQUESTS_IN_PROGRESS = REGISTRY.gauge(
+    "http_requests_in_progress", "Requests currently being handled, by route", ("method", "route"))
+REQUESTS_TOTAL = REGISTRY.counter(
+    "http_requests_total", "Handled requests, by route and status code", ("method", "route", "status"))
+REQUEST_VALIDATION = REGISTRY.histogram(
+    "http_request_validation_seconds", "Time spent reading and validating the request before the endpoint runs",
+    ("method", "route"))
+PROFILE_GENERATION = REGISTRY.histogram(
+    "profile_generation_seconds", "Time spent generating profiles, by path", ("path",))
+EXECUTOR_RUN_DURATION = REGISTRY.histogram(
+    "generation_executor_run_seconds", "Time spent running generation work, by mode (inline or pool)", ("mode",))
+EXECUTOR_QUEUE_WAIT = REGISTRY.histogram(
+    "generation_executor_queue_wait_seconds", "Time pool work waited for a free slot")
+EXECUTOR_PENDING = REGISTRY.gauge(
+    "generation_executor_pending", "Pool work submitted or waiting for a slot")
+EXECUTOR_REJECTED = REGISTRY.counter(
+    "generation_executor_rejected_total", "Pool work rejected because every slot stayed busy")
+ADMISSION_REJECTED = REGISTRY.counter(
+    "admission_rejected_total", "Requests turned away by admission control, by reason", ("reason",))
+ADMISSION_IN_FLIGHT_WRITES = REGISTRY.gauge(
+    "admission_in_flight_writes", "Profile writes admitted and not yet finished")
+LIVE_PREVIEW_CONNECTIONS = REGISTRY.gauge(
+    "live_preview_connections", "Open /api/ws/profile preview connections")
+LIVE_PREVIEW_MESSAGES = REGISTRY.counter(
+    "live_preview_messages_total", "Messages received on preview connections, by type", ("type",))
+MONGO_COMMAND_DURATION = REGISTRY.histogram(
+    "mongo_command_duration_seconds", "MongoDB command round trip time, by collection and command",
+    ("collection", "command"))
+MONGO_COMMAND_FAILURES = REGISTRY.counter(
+    "mongo_command_failures_total", "Failed MongoDB commands, by collection and command", ("collection", "command"))
+MONGO_CHECKOUT_WAIT = REGISTRY.histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool")
+MONGO_CHECKOUT_FAILURES = REGISTRY.counter(
+    "mongo_pool_checkout_failures_total", "Failed connection pool checkouts, by reason", ("reason",))
+MONGO_POOL_CONNECTIONS = REGISTRY.gauge(
+    "mongo_pool_connections", "Pooled MongoDB connections, by state (open, in_use, waiting)", ("state",))
+
+# Start of the request being handled, set by InstrumentedRoute
+_request_started = contextvars.ContextVar("request_started", default=None)
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    APIRoute recording latency, in-flight requests, status codes and validation time per route
+    """
+
+    def get_route_handler(self):
+        method = ",".join(sorted(self.methods or ()))
+        route = self.path
+        duration = REQUEST_DURATION.labels(method, route)
+        in_progress = REQUESTS_IN_PROGRESS.labels(method, route)
+        validation = REQUEST_VALIDATION.labels(method, route)
+
+        # Validation time is everything between the handler starting and the endpoint being called
+        call = self.dependant.call
+        if inspect.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def timed_call(*args, **kwargs):
+                started = _request_started.get()
+                if started is not None:
+                    validation.observe(time.perf_counter() - started)
+                return await call(*args, **kwargs)
+
+            self.dependant.call = timed_call
+
+        handler = super().get_route_handler()
+
+        async def instrumented_handler(request):
+            started = time.perf_counter()
+            token = _request_started.set(started)
+            in_progress.inc()
+            status = 500
+            try:
+                response = await handler(request)
+                status = response.status_code
+                return response
+            except HTTPException as e:
+                status = e.status_code
+                raise
+            except RequestValidationError:
+                status = 422
+                raise
+            finally:
+                in_progress.dec()
+                duration.observe(time.perf_counter() - started)
+                REQUESTS_TOTAL.labels(method, route, status).inc()
+                _request_started.reset(token)
+
+        return instrumented_handler
+
+
+class timed:
+    """
+    Context manager observing the elapsed time of its block on a histogram child
+    """
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started)
+        return False
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Records the duration of every command by collection and command name
+    """
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            collection = event.command.get("collection")
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, failed):
+        collection = self._collections.pop(event.request_id, "")
+        with self._lock:
+            MONGO_COMMAND_DURATION.labels(collection, event.command_name).observe(event.duration_micros / 1e6)
+            if failed:
+                MONGO_COMMAND_FAILURES.labels(collection, event.command_name).inc()
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """
+    Records how long operations wait to check a connection out of the pool, and how many
+    connections are open, in use and waited for
+    """
+
+    def __init__(self):
+        # Checkouts run on the thread executing the operation, so the start time is per thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open = MONGO_POOL_CONNECTIONS.labels("open")
+        self._in_use = MONGO_POOL_CONNECTIONS.labels("in_use")
+        self._waiting = MONGO_POOL_CONNECTIONS.labels("waiting")
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        with self._lock:
+            self._waiting.inc()
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, "started", None)
+        with self._lock:
+            self._waiting.dec()
+            self._in_use.inc()
+            if started is not None:
+                MONGO_CHECKOUT_WAIT.labels().observe(time.perf_counter() - started)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._waiting.dec()
+            MONGO_CHECKOUT_FAILURES.labels(event.reason).inc()
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._in_use.dec()
+
+    def connection_created(self, event):
+        with self._lock:
+            self._open.inc()
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._open.dec()
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+def mongo_event_listeners():
+    return [MongoCommandListener(), MongoPoolListener()]
+
+
+def mongo_pool_stats():
+    """
+    Connection counts tracked by MongoPoolListener, plus checkout wait totals
+    """
+    wait = MONGO_CHECKOUT_WAIT.labels()
+    return {
+        'open': MONGO_POOL_CONNECTIONS.labels("open").value,
+        'inUse': MONGO_POOL_CONNECTIONS.labels("in_use").value,
+        'waiting': MONGO_POOL_CONNECTIONS.labels("waiting").value,
+        'checkouts': wait.count,
+        'avgCheckoutWaitSeconds': wait.sum / wait.count if wait.count else 0.0
+    }
@@ -1,229 +1,373 @@
 # Profile Generator - Backend Logic for Law of One Spiritual Profiles
 
-def generate_spiritual_profile(energy_centers):
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+# Versioned rule definition (thresholds and text), compiled into the lookup tables below at import
+PROFILE_RULES_PATH = Path(os.environ.get('PROFILE_RULES_PATH', Path(__file__).parent / 'profile_rules.json'))
+
+# Number of distinct profiles kept in the compiled profile cache
+PROFILE_CACHE_SIZE = int(os.environ.get('PROFILE_CACHE_SIZE', '4096'))
+
+# Energy centers in the order they are stored and evaluated (lowest to highest)
+CHAKRA_KEYS = ('root', 'sacral', 'solarPlexus', 'heart', 'throat', 'thirdEye', 'crown')
+ENERGY_FIELDS = ('frequency', 'balance', 'blockage')
+FREQUENCY, BALANCE, BLOCKAGE = range(len(ENERGY_FIELDS))
+
+# Every value a uint8 input can hold, so balance lookups never go out of range
+_VALUE_RANGE = 256
+
+
+def _require(condition, message):
+    if not condition:
+        raise ValueError(f'Invalid profile rules: {message}')
+
+
+def _is_text(value):
+    return isinstance(value, str) and bool(value)
+
+
+def _is_score(value):
+    return isinstance(value, int) and not isinstance(value, bool) and 0 <= value <= 100
+
+
+def _validate_tiers(tiers, bound, name, descending):
+    _require(isinstance(tiers, list) and tiers, f'{name} must be a non-empty list')
+    bounds = [tier.get(bound) for tier in tiers]
+    _require(bounds[-1] is None, f'the last entry of {name} must have a null {bound}')
+    _require(all(_is_score(value) for value in bounds[:-1]), f'{name} {bound} values must be integers between 0 and 100')
+    ordered = sorted(bounds[:-1], reverse=descending)
+    _require(bounds[:-1] == ordered and len(set(ordered)) == len(ordered),
+             f'{name} must be strictly {"descending" if descending else "ascending"} by {bound}')
+
+
+def validate_rules(rules):
     """
-    Generate comprehensive spiritual profile based on energy center values
+    Check a rule definition, raising ValueError on the first problem
     """
-    
-    # Calculate overall statistics
-    def calculate_overall_balance():
-        all_centers = list(energy_centers.values())
-        total_balance = sum(center['balance'] for center in all_centers)
-        return round(total_balance / len(all_centers))
-
-    def calculate_overall_level():
-        all_centers = list(energy_centers.values())
-        average_freq = sum(center['frequency'] for center in all_centers) / len(all_centers)
-        average_balance = sum(center['balance'] for center in all_centers) / len(all_centers)
-        average_blockage = sum(center['blockage'] for center in all_centers) / len(all_centers)
-        
-        level = (average_freq + average_balance - average_blockage) / 2
-        
-        if level >= 80:
-            return 'Advanced Seeker'
-        elif level >= 60:
-            return 'Developing Soul'
-        elif level >= 40:
-            return 'Awakening Spirit'
-        else:
-            return 'Beginning Journey'
-
-    def find_dominant_chakra():
-        chakra_names = {
-            'root': 'Root Dominant',
-            'sacral': 'Sacral Dominant',
-            'solarPlexus': 'Solar Dominant',
-            'heart': 'Heart Dominant',
-            'throat': 'Throat Dominant',
-            'thirdEye': 'Third Eye Dominant',
-            'crown': 'Crown Dominant'
-        }
+    _require(isinstance(rules, dict), 'expected a JSON object')
+    _require(_is_text(rules.get('version')), 'version must be a non-empty string')
+
+    thresholds = rules.get('thresholds', {})
+    for name in ('frequencyAbove', 'blockageAbove'):
+        _require(_is_score(thresholds.get(name)), f'thresholds.{name} must be an integer between 0 and 100')
+
+    limits = rules.get('limits', {})
+    for name in ('traits', 'behaviors', 'insights', 'practices', 'growthAreas'):
+        value = limits.get(name)
+        _require(isinstance(value, int) and not isinstance(value, bool) and value > 0,
+                 f'limits.{name} must be a positive integer')
+
+    _validate_tiers(rules.get('levels'), 'minScore', 'levels', descending=True)
+    for level in rules['levels']:
+        _require(_is_text(level.get('name')) and _is_text(level.get('insight')), 'every level needs a name and an insight')
+    _require('{level}' in str(rules.get('levelDescription', '')), 'levelDescription must contain a {level} placeholder')
+
+    _validate_tiers(rules.get('balanceTiers'), 'balanceAbove', 'balanceTiers', descending=True)
+    _validate_tiers(rules.get('practiceTiers'), 'balanceBelow', 'practiceTiers', descending=False)
+    for tier in rules['balanceTiers']:
+        _require(all(_is_text(text) for text in tier.get('insights', [None])), 'balanceTiers insights must be non-empty strings')
+    for tier in rules['practiceTiers']:
+        _require(all(_is_text(text) for text in tier.get('practices', [None])), 'practiceTiers practices must be non-empty strings')
 
-        highest_score = 0
-        dominant_chakra = 'root'
+    chakras = rules.get('chakras', [])
+    _require([chakra.get('key') for chakra in chakras] == list(CHAKRA_KEYS),
+             f'chakras must be listed in the order {", ".join(CHAKRA_KEYS)}')
+    for chakra in chakras:
+        texts = [chakra.get('dominantName')]
+        texts += [chakra.get(state, {}).get(field) for state in ('open', 'blocked') for field in ('trait', 'behavior')]
+        texts += [chakra.get('healing', {}).get(field) for field in ('practice', 'growth')]
+        _require(all(_is_text(text) for text in texts), f'chakra {chakra["key"]} is missing text')
 
-        for key, center in energy_centers.items():
-            score = center['frequency'] + center['balance'] - center['blockage']
-            if score > highest_score:
-                highest_score = score
-                dominant_chakra = key
+    _require(all(_is_text(text) for text in rules.get('universalGrowth', [None])), 'universalGrowth must be non-empty strings')
 
-        return chakra_names[dominant_chakra]
 
-    # Generate personality traits based on energy centers
-    def generate_personality_traits():
+def load_rules(path=PROFILE_RULES_PATH):
+    """
+    Read and validate the rule definition file
+    """
+    with open(path, encoding='utf-8') as rules_file:
+        rules = json.load(rules_file)
+    validate_rules(rules)
+    return rules
+
+
+def _tier_index(bounds, value, above):
+    for index, bound in enumerate(bounds):
+        if bound is None or (value > bound if above else value < bound):
+            return index
+
+
+def _compile_rules(rules):
+    """
+    Flatten a validated rule definition into tuple/array lookups indexed by profile features
+    """
+    limits = rules['limits']
+    chakras = rules['chakras']
+    levels = rules['levels']
+
+    # Trait/behavior selection for every combination of per-chakra states (0 neutral, 1 open, 2 blocked)
+    trait_table = []
+    for code in range(3 ** len(CHAKRA_KEYS)):
         traits = []
         behaviors = []
+        for chakra in chakras:
+            code, state = divmod(code, 3)
+            if state:
+                selected = chakra['open' if state == 1 else 'blocked']
+                traits.append(selected['trait'])
+                behaviors.append(selected['behavior'])
+        trait_table.append((tuple(traits[:limits['traits']]), tuple(behaviors[:limits['behaviors']])))
 
-        # Root chakra influence
-        if energy_centers['root']['frequency'] > 60:
-            traits.append('You have a strong foundation and feel secure in your physical existence.')
-            behaviors.append('You approach challenges with practical wisdom and grounded thinking.')
-        elif energy_centers['root']['blockage'] > 50:
-            traits.append('You may struggle with feelings of insecurity or survival fears.')
-            behaviors.append('You tend to worry about basic needs and material security.')
-
-        # Sacral chakra influence  
-        if energy_centers['sacral']['frequency'] > 60:
-            traits.append('You express creativity freely and maintain healthy emotional boundaries.')
-            behaviors.append('You embrace pleasure and intimacy with balanced enthusiasm.')
-        elif energy_centers['sacral']['blockage'] > 50:
-            traits.append('You may experience creative blocks or emotional numbness.')
-            behaviors.append('You might avoid emotional intimacy or struggle with guilt around pleasure.')
-
-        # Solar Plexus influence
-        if energy_centers['solarPlexus']['frequency'] > 60:
-            traits.append('You possess strong personal power and confident self-expression.')
-            behaviors.append('You take initiative and make decisions with clarity and purpose.')
-        elif energy_centers['solarPlexus']['blockage'] > 50:
-            traits.append('You may struggle with low self-esteem or feelings of powerlessness.')
-            behaviors.append('You tend to second-guess yourself and avoid taking leadership roles.')
-
-        # Heart chakra influence
-        if energy_centers['heart']['frequency'] > 60:
-            traits.append('You radiate love and compassion, creating harmonious relationships.')
-            behaviors.append('You offer support to others naturally and practice forgiveness easily.')
-        elif energy_centers['heart']['blockage'] > 50:
-            traits.append('You may have difficulty trusting others or expressing love freely.')
-            behaviors.append('You tend to build walls to protect yourself from emotional hurt.')
-
-        # Throat chakra influence
-        if energy_centers['throat']['frequency'] > 60:
-            traits.append('You communicate truth with clarity and express yourself authentically.')
-            behaviors.append('You speak up for your beliefs and listen actively to others.')
-        elif energy_centers['throat']['blockage'] > 50:
-            traits.append('You may struggle to express your truth or fear being judged.')
-            behaviors.append('You tend to remain silent when you should speak up.')
-
-        # Third Eye influence
-        if energy_centers['thirdEye']['frequency'] > 60:
-            traits.append('You possess strong intuition and see beyond surface appearances.')
-            behaviors.append('You trust your inner wisdom and make decisions from deep knowing.')
-        elif energy_centers['thirdEye']['blockage'] > 50:
-            traits.append('You may struggle with confusion or difficulty accessing intuitive insights.')
-            behaviors.append('You tend to overthink and rely too heavily on logical analysis.')
-
-        # Crown chakra influence
-        if energy_centers['crown']['frequency'] > 60:
-            traits.append('You feel connected to universal consciousness and divine purpose.')
-            behaviors.append('You seek meaning through spiritual practice and service to others.')
-        elif energy_centers['crown']['blockage'] > 50:
-            traits.append('You may feel spiritually disconnected or question life\'s greater purpose.')
-            behaviors.append('You tend to focus only on material concerns and dismiss spiritual matters.')
-
-        return {
-            'traits': traits[:4],  # Limit to 4 most relevant traits
-            'behaviors': behaviors[:3]  # Limit to 3 most relevant behaviors
-        }
+    balance_bounds = [tier['balanceAbove'] for tier in rules['balanceTiers']]
+    practice_bounds = [tier['balanceBelow'] for tier in rules['practiceTiers']]
 
-    # Generate spiritual development insights
-    def generate_spiritual_insights():
-        overall_balance = calculate_overall_balance()
-        level = calculate_overall_level()
-
-        insights = []
-
-        if overall_balance > 70:
-            insights.append('Your energy centers show remarkable harmony, indicating advanced spiritual development.')
-            insights.append('You have integrated many of your lessons and serve as a beacon for others.')
-        elif overall_balance > 50:
-            insights.append('You are making steady progress on your spiritual journey with growing awareness.')
-            insights.append('Continue working on balancing your energy centers for deeper insights.')
-        else:
-            insights.append('You are at the beginning of a beautiful spiritual awakening.')
-            insights.append('Focus on healing and opening your energy centers gradually and lovingly.')
-
-        # Add level-specific insights
-        if 'Advanced' in level:
-            insights.append('You may be called to teach or guide others on their spiritual paths.')
-        elif 'Developing' in level:
-            insights.append('This is an excellent time to deepen your meditation and self-reflection practices.')
-        else:
-            insights.append('Begin with simple mindfulness practices and gentle energy work.')
-
-        return {
-            'level': f'You are currently at the "{level}" stage of spiritual development. This indicates your readiness for specific types of growth and service.',
-            'insights': insights[:3]
-        }
+    return {
+        'version': rules['version'],
+        'frequency_above': rules['thresholds']['frequencyAbove'],
+        'blockage_above': rules['thresholds']['blockageAbove'],
+        'level_thresholds': np.array([level['minScore'] for level in levels[:-1]], dtype=np.float64),
+        'level_names': tuple(level['name'] for level in levels),
+        'level_descriptions': tuple(rules['levelDescription'].format(level=level['name']) for level in levels),
+        'dominant_names': tuple(chakra['dominantName'] for chakra in chakras),
+        'trait_table': tuple(trait_table),
+        # [balance tier][level] -> insights
+        'insight_table': tuple(
+            tuple(tuple([*tier['insights'], level['insight']][:limits['insights']]) for level in levels)
+            for tier in rules['balanceTiers']
+        ),
+        # [practice tier][most blocked chakra] -> practices
+        'practice_table': tuple(
+            tuple(tuple([*tier['practices'], chakra['healing']['practice']][:limits['practices']]) for chakra in chakras)
+            for tier in rules['practiceTiers']
+        ),
+        # [most blocked chakra] -> growth areas
+        'growth_table': tuple(
+            tuple([chakra['healing']['growth'], *rules['universalGrowth']][:limits['growthAreas']]) for chakra in chakras
+        ),
+        # [overall balance] -> tier index
+        'balance_tier': tuple(_tier_index(balance_bounds, value, above=True) for value in range(_VALUE_RANGE)),
+        'practice_tier': tuple(_tier_index(practice_bounds, value, above=False) for value in range(_VALUE_RANGE))
+    }
 
-    # Generate healing recommendations
-    def generate_healing_practices():
-        practices = []
-        growth_areas = []
-
-        # Find the most blocked chakra
-        most_blocked = 'root'
-        highest_blockage = 0
-        
-        for key, center in energy_centers.items():
-            if center['blockage'] > highest_blockage:
-                highest_blockage = center['blockage']
-                most_blocked = key
-
-        # General practices based on overall state
-        overall_balance = calculate_overall_balance()
-        if overall_balance < 50:
-            practices.append('Begin each day with 10 minutes of grounding meditation to stabilize your energy.')
-            practices.append('Practice deep breathing exercises to clear energetic blockages.')
-        else:
-            practices.append('Maintain your progress with daily energy alignment practices.')
-            practices.append('Consider energy healing modalities like Reiki or crystal work.')
-
-        # Specific recommendations based on most blocked chakra
-        chakra_healing = {
-            'root': {
-                'practice': 'Spend time in nature, practice yoga poses like child\'s pose and mountain pose.',
-                'growth': 'Work on building financial security and stable relationships.'
-            },
-            'sacral': {
-                'practice': 'Engage in creative activities, dance, and practice hip-opening yoga poses.',
-                'growth': 'Explore healthy expressions of sexuality and emotional intimacy.'
-            },
-            'solarPlexus': {
-                'practice': 'Practice power poses, affirmations, and core-strengthening exercises.',
-                'growth': 'Develop leadership skills and practice setting healthy boundaries.'
-            },
-            'heart': {
-                'practice': 'Practice loving-kindness meditation and heart-opening yoga poses.',
-                'growth': 'Work on forgiveness practices and opening to deeper relationships.'
-            },
-            'throat': {
-                'practice': 'Practice chanting, singing, or journaling to express your truth.',
-                'growth': 'Work on authentic communication and creative self-expression.'
-            },
-            'thirdEye': {
-                'practice': 'Practice meditation, visualization, and dream work to enhance intuition.',
-                'growth': 'Develop psychic abilities and trust in your inner knowing.'
-            },
-            'crown': {
-                'practice': 'Engage in prayer, meditation, and study of spiritual texts.',
-                'growth': 'Explore your connection to the divine and life\'s greater purpose.'
-            }
-        }
 
-        if most_blocked in chakra_healing:
-            practices.append(chakra_healing[most_blocked]['practice'])
-            growth_areas.append(chakra_healing[most_blocked]['growth'])
+_RULES = _compile_rules(load_rules())
+
+RULE_VERSION = _RULES['version']
+DOMINANT_NAMES = _RULES['dominant_names']
+LEVEL_NAMES = _RULES['level_names']
+LEVEL_THRESHOLDS = tuple(_RULES['level_thresholds'].tolist())
+
+_TRAIT_STATE_WEIGHTS = 3 ** np.arange(len(CHAKRA_KEYS))
+
+
+class ProfileFeatures(NamedTuple):
+    """
+    Per-row derived values that fully determine a generated profile
+    """
+    overall_balance: np.ndarray
+    level_index: np.ndarray
+    dominant_index: np.ndarray
+    most_blocked_index: np.ndarray
+    trait_code: np.ndarray
+
+
+def energy_centers_to_array(energy_centers):
+    """
+    Convert an energy centers dict into a (7, 3) uint8 array in CHAKRA_KEYS order
+    """
+    return np.array(
+        [[energy_centers[key][field] for field in ENERGY_FIELDS] for key in CHAKRA_KEYS],
+        dtype=np.uint8
+    )
+
+
+def energy_centers_to_values(energy_centers):
+    """
+    The 21 values of an energy centers dict in CHAKRA_KEYS x ENERGY_FIELDS order
+    """
+    return [energy_centers[key][field] for key in CHAKRA_KEYS for field in ENERGY_FIELDS]
+
+
+def array_to_energy_centers(values):
+    """
+    Convert a (7, 3) array back into the energy centers dict shape
+    """
+    return {
+        key: dict(zip(ENERGY_FIELDS, row))
+        for key, row in zip(CHAKRA_KEYS, np.asarray(values).tolist())
+    }
+
+
+def values_to_energy_centers(values):
+    """
+    Energy centers dict for 21 values in CHAKRA_KEYS x ENERGY_FIELDS order
+    """
+    width = len(ENERGY_FIELDS)
+    return {
+        key: dict(zip(ENERGY_FIELDS, values[index * width:(index + 1) * width]))
+        for index, key in enumerate(CHAKRA_KEYS)
+    }
+
+
+def analyze_energy_centers(values):
+    """
+    Compute the profile features for an (N, 7, 3) array of energy center values
+    """
+    values = np.asarray(values)
+    if values.ndim != 3 or values.shape[1:] != (len(CHAKRA_KEYS), len(ENERGY_FIELDS)):
+        raise ValueError(f'Expected an (N, 7, 3) array, got shape {values.shape}')
+
+    values = values.astype(np.int64)
+    frequency = values[:, :, FREQUENCY]
+    blockage = values[:, :, BLOCKAGE]
+
+    # Per-field averages, combined in the same order as before so the floats match exactly
+    averages = values.sum(axis=1) / len(CHAKRA_KEYS)
+    overall_balance = np.rint(averages[:, BALANCE]).astype(np.int64)
+    level = (averages[:, FREQUENCY] + averages[:, BALANCE] - averages[:, BLOCKAGE]) / 2
+    level_index = (level[:, np.newaxis] < _RULES['level_thresholds']).sum(axis=1)
 
-        # Add universal growth recommendations
-        growth_areas.append('Continue regular spiritual practice to maintain and deepen your growth.')
-        growth_areas.append('Consider working with a spiritual teacher or joining a like-minded community.')
+    # Highest positive score wins, earliest chakra on ties, root when nothing is positive
+    scores = frequency + values[:, :, BALANCE] - blockage
+    dominant_index = scores.argmax(axis=1)
+    dominant_index[scores.max(axis=1) <= 0] = 0
+
+    most_blocked_index = blockage.argmax(axis=1)
+
+    open_centers = frequency > _RULES['frequency_above']
+    blocked_centers = ~open_centers & (blockage > _RULES['blockage_above'])
+    trait_code = (open_centers + 2 * blocked_centers) @ _TRAIT_STATE_WEIGHTS
+
+    return ProfileFeatures(overall_balance, level_index, dominant_index, most_blocked_index, trait_code)
+
+
+def analyze_energy_values(values):
+    """
+    analyze_energy_centers for a single row of 21 values in CHAKRA_KEYS x ENERGY_FIELDS order,
+    in plain Python: for one row the NumPy passes cost more than the arithmetic. Returns the
+    features as a tuple of ints.
+    """
+    count = len(CHAKRA_KEYS)
+    frequency = values[FREQUENCY::len(ENERGY_FIELDS)]
+    balance = values[BALANCE::len(ENERGY_FIELDS)]
+    blockage = values[BLOCKAGE::len(ENERGY_FIELDS)]
 
-        return {
-            'practices': practices[:3],
-            'growthAreas': growth_areas[:3]
+    # Same float operations as the array path, so levels on a threshold agree
+    average_balance = sum(balance) / count
+    level = (sum(frequency) / count + average_balance - sum(blockage) / count) / 2
+    level_index = sum(level < threshold for threshold in LEVEL_THRESHOLDS)
+
+    scores = [f + b - k for f, b, k in zip(frequency, balance, blockage)]
+    highest_score = max(scores)
+    dominant_index = scores.index(highest_score) if highest_score > 0 else 0
+
+    frequency_above, blockage_above = _RULES['frequency_above'], _RULES['blockage_above']
+    trait_code = 0
+    for index in range(count - 1, -1, -1):
+        state = 1 if frequency[index] > frequency_above else 2 if blockage[index] > blockage_above else 0
+        trait_code = trait_code * 3 + state
+
+    return round(average_balance), level_index, dominant_index, blockage.index(max(blockage)), trait_code
+
+
+def build_profile(overall_balance, level_index, dominant_index, most_blocked_index, trait_code):
+    """
+    Assemble the profile dict for a single row of features
+    """
+    traits, behaviors = _RULES['trait_table'][trait_code]
+    return {
+        'overallLevel': LEVEL_NAMES[level_index],
+        'overallBalance': overall_balance,
+        'dominantChakra': DOMINANT_NAMES[dominant_index],
+        'personality': {
+            'traits': list(traits),
+            'behaviors': list(behaviors)
+        },
+        'spiritual': {
+            'level': _RULES['level_descriptions'][level_index],
+            'insights': list(_RULES['insight_table'][_RULES['balance_tier'][overall_balance]][level_index])
+        },
+        'healing': {
+            'practices': list(_RULES['practice_table'][_RULES['practice_tier'][overall_balance]][most_blocked_index]),
+            'growthAreas': list(_RULES['growth_table'][most_blocked_index])
         }
+    }
+
 
-    # Generate the complete profile
-    personality = generate_personality_traits()
-    spiritual = generate_spiritual_insights()
-    healing = generate_healing_practices()
+def generate_spiritual_profiles(values):
+    """
+    Generate spiritual profiles for an (N, 7, 3) array of frequency/balance/blockage values
+    """
+    features = analyze_energy_centers(values)
+    return [build_profile(*row) for row in zip(*(column.tolist() for column in features))]
 
+
+def generate_spiritual_profile(energy_centers):
+    """
+    Generate comprehensive spiritual profile based on energy center values
+    """
+    return build_profile(*analyze_energy_values(energy_centers_to_values(energy_centers)))
+
+
+def encode_json(content):
+    """
+    Encode content exactly like the API's default JSON responses
+    """
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode('utf-8')
+
+
+@lru_cache(maxsize=PROFILE_CACHE_SIZE)
+def _compiled_profile(*features):
+    profile = build_profile(*features)
+    return profile, encode_json(profile)
+
+
+def lookup_profiles(values):
+    """
+    Same as generate_spiritual_profiles, but served from the compiled profile cache.
+    Returns (profile, profile_json) pairs; the profile dicts are shared and must not be mutated.
+    """
+    features = analyze_energy_centers(values)
+    return [_compiled_profile(*row) for row in zip(*(column.tolist() for column in features))]
+
+
+def lookup_profile_dicts(values):
+    """
+    The profile dicts of lookup_profiles, for callers that don't need the encoded JSON
+    """
+    return [profile for profile, _ in lookup_profiles(values)]
+
+
+def lookup_profile(energy_centers):
+    """
+    Cached (profile, profile_json) pair for a single energy centers dict
+    """
+    return _compiled_profile(*analyze_energy_values(energy_centers_to_values(energy_centers)))
+
+
+def lookup_profile_values(values):
+    """
+    Cached (profile, profile_json) pair for 21 values in CHAKRA_KEYS x ENERGY_FIELDS order
+    """
+    return _compiled_profile(*analyze_energy_values(values))
+
+
+def profile_cache_info():
+    """
+    Hit/miss counters of the compiled profile cache
+    """
+    info = _compiled_profile.cache_info()
+    lookups = info.hits + info.misses
     return {
-        'overallLevel': calculate_overall_level(),
-        'overallBalance': calculate_overall_balance(),
-        'dominantChakra': find_dominant_chakra(),
-        'personality': personality,
-        'spiritual': spiritual,
-        'healing': healing
-    }
\ No newline at end of file
+        'hits': info.hits,
+        'misses': info.misses,
+        'hitRate': info.hits / lookups if lookups else 0.0,
+        'size': info.currsize,
+        'maxSize': info.maxsize
+    }
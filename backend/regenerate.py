@@ -0,0 +1,161 @@
+# Profile regeneration - rewrites stored generatedProfile output after a rule change, resumably
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from analytics import rebuild_rollups
+from energy_codec import energy_array
+from profile_generator import RULE_VERSION, lookup_profile_dicts
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_COLLECTION = "job_checkpoints"
+
+# Documents read and written per round trip
+REGENERATE_BATCH_SIZE = int(os.environ.get('REGENERATE_BATCH_SIZE', '1000'))
+
+# Default ceiling on documents rewritten per second, leaving headroom for live traffic
+REGENERATE_RATE = float(os.environ.get('REGENERATE_RATE', '2000'))
+
+
+def _checkpoint_id(rule_version):
+    # One checkpoint per target rule version, so a newer rule set starts from the beginning
+    return f"regenerate:{rule_version}"
+
+
+async def regenerate_profiles(db, batch_size=REGENERATE_BATCH_SIZE, rate=REGENERATE_RATE, restart=False):
+    """
+    Recompute generatedProfile for every profile whose ruleVersion differs from RULE_VERSION.
+
+    Walks energy_profiles in _id order, batch_size documents at a time, and checkpoints the
+    last _id of every written batch, so a rerun continues where a crashed one stopped.
+    Documents that fail are logged and skipped; rerun with restart=True to retry them, as
+    only documents still on an old ruleVersion are touched. `rate` caps documents per second
+    (None or 0 for no limit). The analytics rollups depend on the rules as well and need a
+    rebuild afterwards.
+    """
+    checkpoints = db[CHECKPOINT_COLLECTION]
+    checkpoint_id = _checkpoint_id(RULE_VERSION)
+    checkpoint = None if restart else await checkpoints.find_one({"_id": checkpoint_id})
+    if checkpoint and checkpoint.get("finishedAt"):
+        logger.info(f"Regeneration to rule version {RULE_VERSION} already finished at {checkpoint['finishedAt']}")
+        return checkpoint
+
+    last_id = checkpoint["lastId"] if checkpoint else None
+    stats = {
+        "processed": checkpoint.get("processed", 0) if checkpoint else 0,
+        "updated": checkpoint.get("updated", 0) if checkpoint else 0,
+        "failed": checkpoint.get("failed", 0) if checkpoint else 0,
+    }
+    if checkpoint is None:
+        await checkpoints.replace_one(
+            {"_id": checkpoint_id},
+            {"lastId": None, **stats, "ruleVersion": RULE_VERSION, "startedAt": datetime.utcnow(), "finishedAt": None},
+            upsert=True
+        )
+    else:
+        logger.info(f"Resuming regeneration after _id {last_id} ({stats['processed']} documents done)")
+
+    started = time.monotonic()
+    paced = 0
+    while True:
+        # Inputs-only profiles are generated on read and always follow the current rules
+        query = {"ruleVersion": {"$ne": RULE_VERSION}, "generatedProfile": {"$exists": True}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await db.energy_profiles.find(
+            query, {"sessionId": 1, "energyCenters": 1}
+        ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        documents, values = [], []
+        for document in batch:
+            try:
+                values.append(energy_array(document["energyCenters"]))
+                documents.append(document)
+            except (KeyError, TypeError, ValueError, OverflowError) as e:
+                stats["failed"] += 1
+                logger.error(f"Skipping profile {document['_id']} with unreadable energyCenters: {str(e)}")
+
+        if documents:
+            now = datetime.utcnow()
+            updates = [
+                UpdateOne(
+                    {"_id": document["_id"]},
+                    {"$set": {"generatedProfile": profile, "ruleVersion": RULE_VERSION, "updatedAt": now}}
+                )
+                for document, profile in zip(documents, lookup_profile_dicts(np.stack(values)))
+            ]
+            try:
+                result = await db.energy_profiles.bulk_write(updates, ordered=False)
+                stats["updated"] += result.modified_count
+            except BulkWriteError as e:
+                stats["updated"] += e.details.get("nModified", 0)
+                stats["failed"] += len(e.details.get("writeErrors", []))
+                for error in e.details.get("writeErrors", []):
+                    logger.error(f"Error regenerating profile {documents[error['index']]['_id']}: {error['errmsg']}")
+            # Session ETags include regeneratedAt, so cached history pages of these sessions go stale
+            await db.sessions.update_many(
+                {"sessionId": {"$in": list({document["sessionId"] for document in documents})}},
+                {"$set": {"regeneratedAt": now}}
+            )
+
+        last_id = batch[-1]["_id"]
+        stats["processed"] += len(batch)
+        await checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"lastId": last_id, **stats, "updatedAt": datetime.utcnow()}}
+        )
+        logger.info(f"Regenerated up to _id {last_id}: {stats['updated']} updated, {stats['failed']} failed")
+
+        # Sleep off any time this run is ahead of the rate limit
+        paced += len(batch)
+        if rate:
+            ahead = paced / rate - (time.monotonic() - started)
+            if ahead > 0:
+                await asyncio.sleep(ahead)
+
+    await checkpoints.update_one({"_id": checkpoint_id}, {"$set": {"finishedAt": datetime.utcnow()}})
+    logger.info(f"Regeneration to rule version {RULE_VERSION} finished: {stats}")
+    return stats
+
+
+def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Regenerate stored profiles with the current profile rules")
+    parser.add_argument("--batch-size", type=int, default=REGENERATE_BATCH_SIZE)
+    parser.add_argument("--rate", type=float, default=REGENERATE_RATE, help="max documents per second, 0 for no limit")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and walk from the start")
+    parser.add_argument("--rebuild-rollups", action="store_true", help="rebuild the analytics rollups when done")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    async def run():
+        client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+        try:
+            db = client[os.environ['DB_NAME']]
+            await regenerate_profiles(db, batch_size=args.batch_size, rate=args.rate, restart=args.restart)
+            if args.rebuild_rollups:
+                logger.info(f"Rebuilt {await rebuild_rollups(db)} rollup documents")
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,151 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, HTTPException, Body, Header, Query, Request, WebSocket, WebSocketDisconnect
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
+from starlette.requests import HTTPConnection
+from starlette.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from pymongo.pool import PoolOptions
+from bson import ObjectId
 import os
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, ValidationError, validator
 from typing import List, Optional, Dict, Any
 import uuid
+import tempfile
+import base64
+import binascii
+import hmac
 from datetime import datetime
+import numpy as np
+import orjson
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, LIVE_PREVIEW_CONNECTIONS, LIVE_PREVIEW_MESSAGES, PROFILE_GENERATION, REGISTRY,
+    mongo_event_listeners, mongo_pool_stats, timed
+)
+from fast_json import FastJSONResponse
+from fast_ingest import InstrumentedFastBodyRoute, ParsedProfileRequest, fast_body, parse_profile_request
+from live_preview import PreviewError, PreviewState, parse_message, reply, splice_reply
+
+# MongoDB connection, opened when the app starts (see create_app) so importing needs no database.
+# This module-level state, like the save cache, limiters and background workers below, belongs
+# to the one app a process runs.
+client = None
+db = None
+pool_settings = {}
+running_app = None
+
+# Connection pool settings of each worker process: Motor client option -> environment variable
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": "MONGO_MAX_POOL_SIZE",
+    "minPoolSize": "MONGO_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+}
 
-# Create the main app without a prefix
-app = FastAPI()
+# Connections opened by concurrent pings at startup, defaults to minPoolSize (at least one)
+MONGO_WARM_CONNECTIONS = int(os.environ.get('MONGO_WARM_CONNECTIONS', '0'))
+
+# How long /api/health/ready waits for a ping before reporting not ready
+READINESS_TIMEOUT_MS = int(os.environ.get('READINESS_TIMEOUT_MS', '2000'))
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", route_class=InstrumentedFastBodyRoute)
 
 # Profile Generation Logic
-from profile_generator import generate_spiritual_profile
+from profile_generator import (
+    CHAKRA_KEYS, ENERGY_FIELDS, RULE_VERSION, encode_json, lookup_profile_values, lookup_profile_dicts,
+    profile_cache_info
+)
+
+from executor import ExecutorBusy, GenerationExecutor
+from admission import SessionRateLimiter, WriteLimiter, retry_after
+from write_behind import WriteBehindBuffer, WriteQueueFull
+from debounce import SaveDebouncer
+from indexes import bootstrap_indexes
+from analytics import ROLLUP_COLLECTION, read_analytics, rollup_updates
+from trends import read_trends, session_trend_fields
+from idempotency import (
+    MAX_KEY_LENGTH as IDEMPOTENCY_MAX_KEY_LENGTH, IdempotencyConflict, SaveCache, SavedProfile, dedup_key,
+    input_fingerprint
+)
+from energy_codec import (
+    decode_profile, decode_profiles, energy_array, read_projection, stored_profile, stores_generated_profiles
+)
+from export import MEDIA_TYPES as EXPORT_MEDIA_TYPES, iter_batches, iter_csv, iter_ndjson, write_parquet
+
+# Upper bound on the number of profiles accepted by a single batch request
+MAX_BATCH_SIZE = 5000
+
+# Page size limits for GET /api/profiles/{session_id}
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 200
+
+# Field names accepted by the history `fields` projection; generatedProfile parts may be named directly
+HISTORY_FIELDS = {
+    "sessionId": "sessionId",
+    "energyCenters": "energyCenters",
+    "generatedProfile": "generatedProfile",
+    "overallLevel": "generatedProfile.overallLevel",
+    "overallBalance": "generatedProfile.overallBalance",
+    "dominantChakra": "generatedProfile.dominantChakra",
+    "personality": "generatedProfile.personality",
+    "spiritual": "generatedProfile.spiritual",
+    "healing": "generatedProfile.healing",
+    "ruleVersion": "ruleVersion",
+    "createdAt": "createdAt",
+    "updatedAt": "updatedAt"
+}
+
+# Stored profiles are rewritten by backend/regenerate.py after a rule change, so both kinds of
+# response are revalidated against their ETag on every use
+PROFILE_CACHE_CONTROL = "public, no-cache"
+SESSION_CACHE_CONTROL = "no-cache"
+
+# Write-behind mode: POST /api/profiles returns as soon as the profile is queued
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', 'false').lower() == 'true'
+
+# Per-session save debouncing: only profiles left unchanged for this long are stored (0 disables)
+SAVE_DEBOUNCE_MS = int(os.environ.get('SAVE_DEBOUNCE_MS', '0'))
+SAVE_DEBOUNCE_MAX_WAIT_MS = int(os.environ.get('SAVE_DEBOUNCE_MAX_WAIT_MS', '10000'))
+
+# Per-session token bucket on POST /api/profiles: saves per second and burst size (0 disables).
+# Saves without a sessionId share one bucket per client address.
+SESSION_RATE_LIMIT = float(os.environ.get('SESSION_RATE_LIMIT', '10'))
+SESSION_RATE_BURST = int(os.environ.get('SESSION_RATE_BURST', '20'))
+SESSION_RATE_MAX_SESSIONS = int(os.environ.get('SESSION_RATE_MAX_SESSIONS', '100000'))
+
+# Profile writes allowed in flight at once, beyond that saves get a 503 (0 disables)
+MAX_IN_FLIGHT_WRITES = int(os.environ.get('MAX_IN_FLIGHT_WRITES', '64'))
+
+# Batches larger than GENERATION_INLINE_MAX profiles are generated in GENERATION_WORKERS processes (0 disables)
+generation_executor = GenerationExecutor(
+    workers=int(os.environ.get('GENERATION_WORKERS', '0')),
+    inline_max=int(os.environ.get('GENERATION_INLINE_MAX', '256')),
+    max_pending=int(os.environ.get('GENERATION_MAX_PENDING', '0')) or None,
+    queue_timeout=int(os.environ.get('GENERATION_QUEUE_TIMEOUT_MS', '1000')) / 1000
+)
+
+# Bearer token GET /api/export/profiles requires; the route is disabled while unset, backend/export.py
+# exports from the command line
+EXPORT_API_TOKEN = os.environ.get('EXPORT_API_TOKEN', '')
+
+# Startup query plan check for unindexed queries: "warn", "fail" or "off"
+INDEX_PLAN_CHECK = os.environ.get('INDEX_PLAN_CHECK', 'warn').lower()
 
 # Define Models
 class EnergyCenterData(BaseModel):
@@ -72,6 +191,7 @@ class EnergyProfile(BaseModel):
     sessionId: str
     energyCenters: Dict[str, Dict[str, int]]
     generatedProfile: GeneratedProfile
+    ruleVersion: Optional[str] = None  # profile rule set that produced generatedProfile
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
 
@@ -88,105 +208,624 @@ class Session(BaseModel):
     class Config:
         allow_population_by_field_name = True
 
+_single_generation_time = PROFILE_GENERATION.labels("single")
+_batch_generation_time = PROFILE_GENERATION.labels("batch")
+
+REGISTRY.callback("counter", "profile_cache_hits_total", "Compiled profile cache hits",
+                  lambda: profile_cache_info()["hits"])
+REGISTRY.callback("counter", "profile_cache_misses_total", "Compiled profile cache misses",
+                  lambda: profile_cache_info()["misses"])
+REGISTRY.callback("gauge", "profile_cache_size", "Profiles held in the compiled profile cache",
+                  lambda: profile_cache_info()["size"])
+
+def _energy_centers_dict(energy_centers: EnergyCentersInput) -> Dict[str, Dict[str, int]]:
+    return {
+        "root": energy_centers.root.dict(),
+        "sacral": energy_centers.sacral.dict(),
+        "solarPlexus": energy_centers.solarPlexus.dict(),
+        "heart": energy_centers.heart.dict(),
+        "throat": energy_centers.throat.dict(),
+        "thirdEye": energy_centers.thirdEye.dict(),
+        "crown": energy_centers.crown.dict()
+    }
+
+def _energy_centers_values(energy_centers: EnergyCentersInput) -> List[int]:
+    return [getattr(getattr(energy_centers, key), field) for key in CHAKRA_KEYS for field in ENERGY_FIELDS]
+
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" if detail["loc"] else detail["msg"]
+        for detail in error.errors()
+    )
+
+def _session_updates(documents: List[Dict[str, Any]], now: datetime) -> List[UpdateOne]:
+    """
+    One upsert per distinct session, bumping profileCount by the number of profiles saved for it
+    and folding their values into its trends. The moving averages need the stored value, so this
+    is an update pipeline rather than $inc/$min/$max, still a single round trip per bulk write.
+    """
+    session_counts = {}
+    for document in documents:
+        session_counts[document["sessionId"]] = session_counts.get(document["sessionId"], 0) + 1
+    trend_fields = session_trend_fields(documents)
+    return [
+        UpdateOne(
+            {"sessionId": session_id},
+            [{"$set": {
+                "sessionId": session_id,
+                "profileCount": {"$add": [{"$ifNull": ["$profileCount", 0]}, count]},
+                "createdAt": {"$ifNull": ["$createdAt", now]},
+                "lastAccessedAt": now,
+                **trend_fields[session_id]
+            }}],
+            upsert=True
+        )
+        for session_id, count in session_counts.items()
+    ]
+
+async def _persist_profiles(documents: List[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    Insert profile documents, then bump their sessions' counters and the analytics rollups.
+    Returns the error message of every document that failed to insert, keyed by position.
+    """
+    # insert_many assigns _id on every document before sending, failed ones are reported by index
+    write_errors = {}
+    try:
+        await db.energy_profiles.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        write_errors = {error["index"]: error["errmsg"] for error in e.details.get("writeErrors", [])}
+
+    inserted = [document for position, document in enumerate(documents) if position not in write_errors]
+    if not inserted:
+        return write_errors
+
+    # Session counters and analytics rollups are independent, so both bulk writes go out together
+    await asyncio.gather(
+        db.sessions.bulk_write(_session_updates(inserted, datetime.utcnow()), ordered=False),
+        db[ROLLUP_COLLECTION].bulk_write(rollup_updates(inserted), ordered=False)
+    )
+
+    return write_errors
+
+write_buffer = WriteBehindBuffer(
+    _persist_profiles,
+    max_queue=int(os.environ.get('WRITE_BEHIND_MAX_QUEUE', '10000')),
+    max_batch=int(os.environ.get('WRITE_BEHIND_MAX_BATCH', '500')),
+    flush_interval=int(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL_MS', '50')) / 1000,
+    put_timeout=int(os.environ.get('WRITE_BEHIND_PUT_TIMEOUT_MS', '1000')) / 1000
+) if WRITE_BEHIND_ENABLED else None
+
+if write_buffer is not None:
+    REGISTRY.callback("gauge", "write_behind_queue_depth", "Profiles waiting in the write-behind queue",
+                      lambda: write_buffer.stats()["queueDepth"])
+    REGISTRY.callback("counter", "write_behind_documents_total", "Profiles handled by the write-behind buffer, by outcome",
+                      lambda: {(outcome,): write_buffer.stats()[f"{outcome}Documents"]
+                               for outcome in ("flushed", "failed", "rejected")},
+                      labelnames=("outcome",))
+    REGISTRY.callback("gauge", "write_behind_flush_seconds", "Write-behind flush latency",
+                      lambda: {(kind,): write_buffer.stats()[f"{kind}FlushSeconds"] for kind in ("last", "avg", "max")},
+                      labelnames=("stat",))
+
+async def _store_settled_profiles(documents: List[Dict[str, Any]]) -> Dict[int, str]:
+    if write_buffer is not None:
+        for document in documents:
+            await write_buffer.put(document)
+        return {}
+    return await _persist_profiles(documents)
+
+save_debouncer = SaveDebouncer(
+    _store_settled_profiles,
+    window=SAVE_DEBOUNCE_MS / 1000,
+    max_wait=SAVE_DEBOUNCE_MAX_WAIT_MS / 1000
+) if SAVE_DEBOUNCE_MS > 0 else None
+
+if save_debouncer is not None:
+    REGISTRY.callback("gauge", "save_debounce_pending_sessions", "Sessions with a profile waiting to settle",
+                      lambda: save_debouncer.stats()["pendingSessions"])
+    REGISTRY.callback("counter", "save_debounce_coalesced_total", "Profile saves replaced by a later state",
+                      lambda: save_debouncer.stats()["coalesced"])
+
+# Recent saves by Idempotency-Key and by (sessionId, values), see idempotency.py for the settings
+save_cache = SaveCache()
+
+session_rate_limiter = SessionRateLimiter(
+    SESSION_RATE_LIMIT, SESSION_RATE_BURST, max_keys=SESSION_RATE_MAX_SESSIONS
+) if SESSION_RATE_LIMIT > 0 else None
+write_limiter = WriteLimiter(MAX_IN_FLIGHT_WRITES) if MAX_IN_FLIGHT_WRITES > 0 else None
+
+if session_rate_limiter is not None:
+    REGISTRY.callback("gauge", "admission_tracked_sessions", "Sessions with a rate limit bucket in memory",
+                      lambda: session_rate_limiter.stats()["trackedSessions"])
+
+async def _persist_admitted(documents: List[Dict[str, Any]]) -> Dict[int, str]:
+    """
+    _persist_profiles for a request, refused with a 503 when MAX_IN_FLIGHT_WRITES writes are already running
+    """
+    if write_limiter is None:
+        return await _persist_profiles(documents)
+    if not write_limiter.try_acquire():
+        raise HTTPException(
+            status_code=503,
+            detail="Too many profile writes in progress, please retry",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        return await _persist_profiles(documents)
+    finally:
+        write_limiter.release()
+
+def mongo_client_options() -> Dict[str, int]:
+    return {option: int(os.environ[name]) for option, name in MONGO_CLIENT_OPTIONS.items() if os.environ.get(name)}
+
+async def _warm_up_pool(mongo_client, connections: int):
+    """
+    Open `connections` pooled connections up front with concurrent pings
+    """
+    started = time.perf_counter()
+    await asyncio.gather(*(mongo_client.admin.command("ping") for _ in range(connections)))
+    logger.info(f"Warmed up {connections} MongoDB connections in {time.perf_counter() - started:.2f}s")
+
+def _pool_settings(mongo_client) -> Dict[str, Any]:
+    """
+    Pool options of a Motor client, injected ones included; empty for in-memory stand-ins
+    """
+    pool_options = getattr(getattr(mongo_client, "options", None), "pool_options", None)
+    if not isinstance(pool_options, PoolOptions):
+        return {}
+    return {
+        "maxPoolSize": pool_options.max_pool_size,
+        "minPoolSize": pool_options.min_pool_size,
+        "maxIdleTimeSeconds": pool_options.max_idle_time_seconds,
+        "waitQueueTimeoutSeconds": pool_options.wait_queue_timeout
+    }
+
+def _encode_history_cursor(created_at: datetime, profile_id: ObjectId) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{profile_id}".encode()).decode().rstrip("=")
+
+def _decode_history_cursor(cursor: str):
+    try:
+        created_at, profile_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(profile_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _history_projection(fields: Optional[str]) -> Optional[Dict[str, int]]:
+    """
+    Mongo projection for a comma-separated `fields` list; _id and createdAt are always kept for paging
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in names if name not in HISTORY_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(HISTORY_FIELDS)}"
+        )
+    projection = {HISTORY_FIELDS[name]: 1 for name in names}
+    projection["createdAt"] = 1
+    return projection
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Weak comparison of an If-None-Match header against our ETag
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def _stamp(moment: Optional[datetime]) -> str:
+    return moment.strftime("%Y%m%d%H%M%S%f") if moment else "0"
+
+def _session_etag(session: Optional[Dict[str, Any]]) -> str:
+    """
+    ETag for responses derived from a session's profiles, changes whenever a profile is saved,
+    the rules change or the regeneration job rewrites one of the session's profiles
+    """
+    if not session:
+        return '"s0"'
+    regenerated = session.get("regeneratedAt")
+    epoch = f'-r{_stamp(regenerated)}' if regenerated else ""
+    return f'"s{session.get("profileCount", 0)}-{_stamp(session.get("lastAccessedAt"))}-{RULE_VERSION}{epoch}"'
+
+def _profile_etag(profile: Dict[str, Any]) -> str:
+    """
+    ETag of a decoded profile: the rule set its generatedProfile came from (the current one for
+    inputs-only profiles, the stored one for full profiles the job hasn't reached) and updatedAt,
+    which the regeneration job sets whenever it rewrites one
+    """
+    return f'"p{profile["_id"]}-{profile.get("ruleVersion") or "unversioned"}-{_stamp(profile.get("updatedAt"))}"'
+
+def _not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+def _profile_response(session_id: str, profile_id: str, profile_json: bytes) -> Response:
+    """
+    Splice the pre-encoded profile into the create response instead of re-serializing it
+    """
+    return Response(
+        content=b"".join((
+            b'{"success":true,"sessionId":', encode_json(session_id),
+            b',"profileId":', encode_json(profile_id),
+            b',"profile":', profile_json, b"}"
+        )),
+        media_type="application/json"
+    )
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
     return {"message": "Law of One Profile Generator API", "version": "1.0.0"}
 
-@api_router.post("/profiles", response_model=Dict[str, Any])
-async def create_profile(request: ProfileRequest):
+@api_router.get("/health/ready")
+async def get_readiness():
+    # Ready once MongoDB answers a ping through the pool
+    ping_ms = None
+    if db is not None:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(db.command("ping"), READINESS_TIMEOUT_MS / 1000)
+            ping_ms = (time.perf_counter() - started) * 1000
+        except asyncio.TimeoutError:
+            logging.error(f"Readiness ping timed out after {READINESS_TIMEOUT_MS}ms")
+        except Exception as e:
+            logging.error(f"Readiness ping failed: {str(e)}")
+
+    ready = ping_ms is not None
+    return FastJSONResponse(
+        {"success": ready, "ready": ready, "pingMs": ping_ms, "pool": {**pool_settings, **mongo_pool_stats()}},
+        status_code=200 if ready else 503
+    )
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    return {"success": True, "ruleVersion": RULE_VERSION, "profileCache": profile_cache_info()}
+
+@api_router.get("/storage/stats")
+async def get_storage_stats():
+    return {
+        "success": True,
+        "writeBehind": write_buffer.stats() if write_buffer is not None else None,
+        "saveDebounce": save_debouncer.stats() if save_debouncer is not None else None,
+        "repeatedSaves": save_cache.stats(),
+        "admission": {
+            "sessionRate": session_rate_limiter.stats() if session_rate_limiter is not None else None,
+            "writes": write_limiter.stats() if write_limiter is not None else None
+        }
+    }
+
+async def _find_repeated_save(profile_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    The stored profile a failed insert repeats, found through the keys of its unique indexes
+    """
+    for field in ("idempotencyKey", "dedupKey"):
+        if field in profile_data:
+            existing = await db.energy_profiles.find_one({field: profile_data[field]}, {"sessionId": 1, "energyCenters": 1})
+            if existing is not None:
+                return existing
+    return None
+
+def _client_host(connection: HTTPConnection) -> Optional[str]:
+    return connection.client.host if connection.client is not None else None
+
+def _rate_limit_key(session_id: Optional[str], client_host: Optional[str]):
+    # Anonymous saves are keyed by address; a tuple can't collide with a sessionId
+    return session_id or ("anonymous", client_host)
+
+async def _save_profile(parsed: ParsedProfileRequest, http_request: Request) -> Response:
+    return await _store_profile(parsed, http_request.headers.get("idempotency-key"), _client_host(http_request))
+
+async def _store_profile(
+    parsed: ParsedProfileRequest, idempotency_key: Optional[str] = None, client_host: Optional[str] = None
+) -> Response:
+    """
+    The storage path of POST /api/profiles, shared with the live preview's save message.
+    `client_host` keys the rate limit of saves without a sessionId.
+    """
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= IDEMPOTENCY_MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key must be 1 to {IDEMPOTENCY_MAX_KEY_LENGTH} characters"
+        )
+
+    # A retry or an unchanged resubmission gets the first save's response without a database round trip.
+    # Debounced saves only match by key: a repeat of earlier values must still replace the pending state.
+    fingerprint = input_fingerprint(parsed.values)
+    debounced = save_debouncer is not None and bool(parsed.session_id)
+    try:
+        saved = save_cache.lookup(idempotency_key, parsed.session_id, fingerprint, by_input=not debounced)
+    except IdempotencyConflict:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with different energy values")
+    if saved is not None:
+        return _profile_response(saved.session_id, saved.profile_id, saved.profile_json)
+
     try:
+        # Refuse a session (or anonymous client) saving faster than its token bucket refills before doing any work
+        if session_rate_limiter is not None:
+            wait = session_rate_limiter.acquire(_rate_limit_key(parsed.session_id, client_host))
+            if wait:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many profile saves for this session, please slow down",
+                    headers={"Retry-After": retry_after(wait)}
+                )
+
         # Generate session ID if not provided
-        session_id = request.sessionId or str(uuid.uuid4())
+        session_id = parsed.session_id or str(uuid.uuid4())
         
-        # Convert energy centers to dict format
-        energy_centers_dict = {
-            "root": request.energyCenters.root.dict(),
-            "sacral": request.energyCenters.sacral.dict(),
-            "solarPlexus": request.energyCenters.solarPlexus.dict(),
-            "heart": request.energyCenters.heart.dict(),
-            "throat": request.energyCenters.throat.dict(),
-            "thirdEye": request.energyCenters.thirdEye.dict(),
-            "crown": request.energyCenters.crown.dict()
-        }
+        # Generate spiritual profile (served from the compiled profile cache)
+        with timed(_single_generation_time):
+            generated_profile, profile_json = lookup_profile_values(parsed.values)
         
-        # Generate spiritual profile
-        generated_profile = generate_spiritual_profile(energy_centers_dict)
-        
-        # Create profile object
-        profile_data = {
-            "sessionId": session_id,
-            "energyCenters": energy_centers_dict,
-            "generatedProfile": generated_profile,
-            "createdAt": datetime.utcnow(),
-            "updatedAt": datetime.utcnow()
-        }
-        
-        # Save to database
-        result = await db.energy_profiles.insert_one(profile_data)
-        profile_data["_id"] = str(result.inserted_id)
-        
-        # Update or create session
-        await db.sessions.update_one(
-            {"sessionId": session_id},
-            {
-                "$set": {"lastAccessedAt": datetime.utcnow()},
-                "$inc": {"profileCount": 1},
-                "$setOnInsert": {
-                    "sessionId": session_id,
-                    "createdAt": datetime.utcnow()
-                }
-            },
-            upsert=True
-        )
+        # Create profile object in the configured storage encodings
+        profile_data = stored_profile(session_id, parsed.values, generated_profile, datetime.utcnow())
         
-        return {
-            "success": True,
-            "sessionId": session_id,
-            "profileId": profile_data["_id"],
-            "profile": generated_profile
-        }
+        if debounced:
+            # Intermediate states of a slider drag are returned but only the settled one is stored
+            save_debouncer.submit(profile_data)
+        elif write_buffer is not None:
+            # Assign the id in-process and let the background flusher do the writes
+            profile_data["_id"] = ObjectId()
+            try:
+                await write_buffer.put(profile_data)
+            except WriteQueueFull:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Profile write queue is full, please retry",
+                    headers={"Retry-After": "1"}
+                )
+        else:
+            # Direct writes carry unique keys, catching repeats this process hasn't seen
+            if idempotency_key is not None:
+                profile_data["idempotencyKey"] = idempotency_key
+            if parsed.session_id and save_cache.dedup_enabled:
+                previous = save_cache.last_save(session_id)
+                profile_data["dedupKey"] = dedup_key(
+                    session_id, fingerprint, previous.profile_id if previous else None, profile_data["createdAt"]
+                )
+
+            # Save to database and update or create session
+            write_errors = await _persist_admitted([profile_data])
+            if write_errors:
+                existing = await _find_repeated_save(profile_data)
+                if existing is None:
+                    raise Exception(write_errors[0])
+                if input_fingerprint(energy_array(existing["energyCenters"]).ravel().tolist()) != fingerprint:
+                    raise HTTPException(
+                        status_code=422, detail="Idempotency-Key was already used with different energy values"
+                    )
+                session_id, profile_data["_id"] = existing["sessionId"], existing["_id"]
+
+        saved = SavedProfile(session_id, str(profile_data["_id"]), profile_json, fingerprint)
+        save_cache.remember(idempotency_key, saved, by_input=not debounced)
+        return _profile_response(saved.session_id, saved.profile_id, profile_json)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error creating profile: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error generating profile: {str(e)}")
 
+@api_router.post("/profiles", response_model=Dict[str, Any])
+@fast_body(parse_profile_request, _save_profile)
+async def create_profile(request: ProfileRequest, http_request: Request):
+    # Only reached when the fast path declined the body, e.g. values sent as floats or strings
+    return await _save_profile(
+        ParsedProfileRequest(request.sessionId, _energy_centers_values(request.energyCenters)), http_request
+    )
+
+@api_router.post("/profiles/batch", response_model=Dict[str, Any])
+async def create_profiles_batch(items: List[Any] = Body(...)):
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch size exceeds the limit of {MAX_BATCH_SIZE} profiles")
+
+    try:
+        results = [None] * len(items)
+        valid = []
+
+        # Validate each item on its own so one bad row doesn't reject the whole batch
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, ProfileRequest.parse_obj(item)))
+            except ValidationError as e:
+                results[index] = {
+                    "index": index,
+                    "success": False,
+                    "error": _format_validation_error(e)
+                }
+
+        if valid:
+            values = np.array(
+                [_energy_centers_values(request.energyCenters) for _, request in valid], dtype=np.uint8
+            ).reshape(len(valid), len(CHAKRA_KEYS), len(ENERGY_FIELDS))
+            # The response only carries ids, so profiles stored as inputs need no generation at all
+            generated_profiles = [None] * len(valid)
+            if stores_generated_profiles():
+                with timed(_batch_generation_time):
+                    try:
+                        generated_profiles = await generation_executor.run(lookup_profile_dicts, values)
+                    except ExecutorBusy:
+                        raise HTTPException(
+                            status_code=503,
+                            detail="Profile generation is busy, please retry",
+                            headers={"Retry-After": "1"}
+                        )
+
+            now = datetime.utcnow()
+            documents = [
+                stored_profile(request.sessionId or str(uuid.uuid4()), row, generated_profile, now)
+                for (_, request), row, generated_profile in zip(valid, values, generated_profiles)
+            ]
+
+            write_errors = await _persist_admitted(documents)
+
+            for position, ((index, _), document) in enumerate(zip(valid, documents)):
+                if position in write_errors:
+                    results[index] = {
+                        "index": index,
+                        "success": False,
+                        "error": write_errors[position]
+                    }
+                else:
+                    results[index] = {
+                        "index": index,
+                        "success": True,
+                        "sessionId": document["sessionId"],
+                        "profileId": str(document["_id"])
+                    }
+
+        succeeded = sum(1 for result in results if result["success"])
+        return FastJSONResponse({
+            "success": True,
+            "inserted": succeeded,
+            "failed": len(results) - succeeded,
+            "results": results
+        })
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error creating profile batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating profiles: {str(e)}")
+
+@api_router.get("/analytics")
+async def get_analytics(hours: int = Query(24, ge=1, le=24 * 90)):
+    try:
+        return FastJSONResponse({"success": True, "analytics": await read_analytics(db, hours=hours)})
+
+    except Exception as e:
+        logging.error(f"Error fetching analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error fetching analytics")
+
+def _require_export_token(authorization: Optional[str]):
+    """
+    Exports hold every sessionId, which is all that guards a session's data, so they are admin only
+    """
+    if not EXPORT_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip().encode(), EXPORT_API_TOKEN.encode()):
+        raise HTTPException(
+            status_code=401, detail="Exports need the admin token", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+@api_router.get("/export/profiles")
+async def export_profiles(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv|parquet)$"),
+    session_id: Optional[str] = Query(None, alias="sessionId"),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    authorization: Optional[str] = Header(None)
+):
+    _require_export_token(authorization)
+
+    # Streamed from the cursor batch by batch, memory use doesn't grow with the result
+    batches = iter_batches(db.energy_profiles, session_id, start, end)
+    filename = f"profiles-{session_id}" if session_id else "profiles"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+
+    if export_format != "parquet":
+        chunks = iter_ndjson(batches) if export_format == "ndjson" else iter_csv(batches)
+        return StreamingResponse(chunks, media_type=EXPORT_MEDIA_TYPES[export_format], headers=headers)
+
+    # Parquet needs its footer written last, so it goes through a temporary file
+    path = tempfile.NamedTemporaryFile(suffix=".parquet", delete=False).name
+    try:
+        await write_parquet(batches, path)
+    except RuntimeError as e:
+        os.unlink(path)
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        os.unlink(path)
+        logging.error(f"Error exporting profiles: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error exporting profiles")
+    return FileResponse(
+        path, media_type=EXPORT_MEDIA_TYPES["parquet"], headers=headers, background=BackgroundTask(os.unlink, path)
+    )
+
 @api_router.get("/profiles/{session_id}")
-async def get_profile_history(session_id: str):
+async def get_profile_history(
+    session_id: str,
+    http_request: Request,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    # Newest first, keyset-paginated on (createdAt, _id)
+    query = {"sessionId": session_id}
+    if cursor:
+        created_at, profile_id = _decode_history_cursor(cursor)
+        query["$or"] = [
+            {"createdAt": {"$lt": created_at}},
+            {"createdAt": created_at, "_id": {"$lt": profile_id}}
+        ]
+    projection = _history_projection(fields)
+
     try:
+        if save_debouncer is not None:
+            await save_debouncer.flush_session(session_id)
+
+        # The session is read before the profiles, so a concurrent save can only make the ETag older, never newer
+        session = await db.sessions.find_one({"sessionId": session_id}, {"_id": 0, "profileCount": 1, "lastAccessedAt": 1, "regeneratedAt": 1})
+        etag = _session_etag(session)
+        if _etag_matches(http_request.headers.get("if-none-match"), etag):
+            return _not_modified(etag, SESSION_CACHE_CONTROL)
+
         profiles = await db.energy_profiles.find(
-            {"sessionId": session_id}
-        ).sort("createdAt", -1).to_list(50)
-        
-        # Convert ObjectId to string
-        for profile in profiles:
-            profile["_id"] = str(profile["_id"])
+            query, read_projection(projection)
+        ).sort([("createdAt", -1), ("_id", -1)]).to_list(limit + 1)
+
+        next_cursor = None
+        if len(profiles) > limit:
+            profiles = profiles[:limit]
+            next_cursor = _encode_history_cursor(profiles[-1]["createdAt"], profiles[-1]["_id"])
+        # Packed and inputs-only documents are brought to the stored full shape
+        profiles = decode_profiles(profiles, projection)
         
-        return {
-            "success": True,
-            "sessionId": session_id,
-            "profiles": profiles
-        }
+        # Documents are encoded as read, ObjectId and datetime values included
+        return FastJSONResponse(
+            {
+                "success": True,
+                "sessionId": session_id,
+                "profiles": profiles,
+                "nextCursor": next_cursor
+            },
+            headers={"ETag": etag, "Cache-Control": SESSION_CACHE_CONTROL}
+        )
         
     except Exception as e:
         logging.error(f"Error fetching profile history: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching profile history")
 
 @api_router.get("/profiles/profile/{profile_id}")
-async def get_profile_by_id(profile_id: str):
+async def get_profile_by_id(profile_id: str, http_request: Request):
+    if not ObjectId.is_valid(profile_id):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    object_id = ObjectId(profile_id)
+
     try:
-        from bson import ObjectId
-        profile = await db.energy_profiles.find_one({"_id": ObjectId(profile_id)})
+        if save_debouncer is not None:
+            await save_debouncer.flush_profile(object_id)
+
+        profile = await db.energy_profiles.find_one({"_id": object_id})
         
         if not profile:
             raise HTTPException(status_code=404, detail="Profile not found")
+        # Stored profiles can be rewritten, so the tag comes from the decoded document rather than the id alone
+        profile = decode_profile(profile)
+        etag = _profile_etag(profile)
+        if _etag_matches(http_request.headers.get("if-none-match"), etag):
+            return _not_modified(etag, PROFILE_CACHE_CONTROL)
         
-        profile["_id"] = str(profile["_id"])
-        
-        return {
-            "success": True,
-            "profile": profile
-        }
+        return FastJSONResponse(
+            {
+                "success": True,
+                "profile": profile
+            },
+            headers={"ETag": etag, "Cache-Control": PROFILE_CACHE_CONTROL}
+        )
         
     except HTTPException:
         # Re-raise HTTP exceptions as-is
@@ -196,35 +835,123 @@ async def get_profile_by_id(profile_id: str):
         raise HTTPException(status_code=500, detail="Error fetching profile")
 
 @api_router.get("/sessions/{session_id}/stats")
-async def get_session_stats(session_id: str):
+async def get_session_stats(session_id: str, http_request: Request):
     try:
+        if save_debouncer is not None:
+            await save_debouncer.flush_session(session_id)
+
         session = await db.sessions.find_one({"sessionId": session_id})
+        etag = _session_etag(session)
+        if _etag_matches(http_request.headers.get("if-none-match"), etag):
+            return _not_modified(etag, SESSION_CACHE_CONTROL)
+        headers = {"ETag": etag, "Cache-Control": SESSION_CACHE_CONTROL}
+
         if not session:
-            return {"success": True, "stats": {"profileCount": 0, "firstVisit": None}}
+            return FastJSONResponse({"success": True, "stats": {"profileCount": 0, "firstVisit": None}}, headers=headers)
         
-        return {
-            "success": True,
-            "stats": {
-                "profileCount": session.get("profileCount", 0),
-                "firstVisit": session.get("createdAt"),
-                "lastVisit": session.get("lastAccessedAt")
-            }
-        }
+        return FastJSONResponse(
+            {
+                "success": True,
+                "stats": {
+                    "profileCount": session.get("profileCount", 0),
+                    "firstVisit": session.get("createdAt"),
+                    "lastVisit": session.get("lastAccessedAt")
+                }
+            },
+            headers=headers
+        )
         
     except Exception as e:
         logging.error(f"Error fetching session stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching session stats")
 
-# Include the router in the main app
-app.include_router(api_router)
+@api_router.get("/sessions/{session_id}/trends")
+async def get_session_trends(session_id: str, http_request: Request):
+    try:
+        if save_debouncer is not None:
+            await save_debouncer.flush_session(session_id)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+        # Kept up to date by every save, so this is one document read however long the history
+        session = await db.sessions.find_one(
+            {"sessionId": session_id}, {"_id": 0, "profileCount": 1, "lastAccessedAt": 1, "regeneratedAt": 1, "trends": 1}
+        )
+        etag = _session_etag(session)
+        if _etag_matches(http_request.headers.get("if-none-match"), etag):
+            return _not_modified(etag, SESSION_CACHE_CONTROL)
+
+        return FastJSONResponse(
+            {"success": True, "sessionId": session_id, "trends": read_trends(session)},
+            headers={"ETag": etag, "Cache-Control": SESSION_CACHE_CONTROL}
+        )
+
+    except Exception as e:
+        logging.error(f"Error fetching session trends: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error fetching session trends")
+
+async def _preview_reply(state: PreviewState, text, client_host: Optional[str] = None) -> bytes:
+    """
+    Answer one live preview message: "update" merges energy center values and returns the
+    profile they generate, "save" stores the current state like POST /api/profiles
+    """
+    seq = None
+    try:
+        message = parse_message(text)
+        seq = message.get("seq")
+        message_type = message["type"]
+        LIVE_PREVIEW_MESSAGES.labels(message_type if message_type in ("update", "save") else "other").inc()
+
+        if message_type == "update":
+            if "sessionId" in message:
+                if message["sessionId"] is not None and not isinstance(message["sessionId"], str):
+                    raise PreviewError("sessionId must be a string")
+                state.session_id = message["sessionId"]
+            state.update(message.get("energyCenters", {}))
+            with timed(_single_generation_time):
+                _, profile_json = lookup_profile_values(state.request().values)
+            return splice_reply("profile", seq, b'{"profile":' + profile_json + b"}")
+
+        if message_type == "save":
+            idempotency_key = message.get("idempotencyKey")
+            if idempotency_key is not None and not isinstance(idempotency_key, str):
+                raise PreviewError("idempotencyKey must be a string")
+            body = (await _store_profile(state.request(), idempotency_key, client_host)).body
+            # Later saves of an anonymous connection stay in the session the first one created
+            state.session_id = orjson.loads(body)["sessionId"]
+            return splice_reply("saved", seq, body)
+
+        raise PreviewError(f"Unknown message type {message_type}")
+
+    except PreviewError as e:
+        return reply("error", seq, status=400, detail=str(e))
+    except HTTPException as e:
+        retry = (e.headers or {}).get("Retry-After")
+        fields = {"retryAfter": int(retry)} if retry else {}
+        return reply("error", seq, status=e.status_code, detail=e.detail, **fields)
+
+@api_router.websocket("/ws/profile")
+async def profile_preview(websocket: WebSocket, session_id: Optional[str] = Query(None, alias="sessionId")):
+    # Previews are generated in memory per message; nothing is stored until a save message
+    await websocket.accept()
+    state = PreviewState(session_id)
+    client_host = _client_host(websocket)
+    connections = LIVE_PREVIEW_CONNECTIONS.labels()
+    connections.inc()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            text = message.get("text")
+            if text is None:
+                text = message.get("bytes") or b""
+            await websocket.send_text((await _preview_reply(state, text, client_host)).decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        connections.dec()
+
+async def get_metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
 
 # Configure logging
 logging.basicConfig(
@@ -233,6 +960,68 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+def create_app(mongo_client=None, db_name: Optional[str] = None) -> FastAPI:
+    """
+    Build the API app. Its lifespan connects to MongoDB (or uses `mongo_client`), warms up the
+    pool, ensures indexes and starts the background workers; shutdown flushes and closes them.
+
+    The routes share this module's connection, caches, limiters and workers, so only one app
+    can run per process at a time: starting a second one while another is running raises
+    RuntimeError instead of taking over the first one's database.
+    """
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        global client, db, pool_settings, running_app
+        if running_app is not None:
+            raise RuntimeError("Another app from create_app() is already running in this process")
+        running_app = app
+
+        try:
+            options = mongo_client_options()
+            if mongo_client is None:
+                client = AsyncIOMotorClient(os.environ['MONGO_URL'], event_listeners=mongo_event_listeners(), **options)
+            else:
+                client = mongo_client
+            pool_settings = _pool_settings(client)
+            db = client[db_name or os.environ['DB_NAME']]
+
+            try:
+                await _warm_up_pool(client, MONGO_WARM_CONNECTIONS or max(1, options.get("minPoolSize", 0)))
+            except Exception as e:
+                logger.error(f"Error warming up the MongoDB pool: {str(e)}")
+            await bootstrap_indexes(db, plan_check=INDEX_PLAN_CHECK)
+            await generation_executor.start()
+            if write_buffer is not None:
+                write_buffer.start()
+
+            try:
+                yield
+            finally:
+                # Flush pending and buffered profiles before the connection goes away
+                if save_debouncer is not None:
+                    await save_debouncer.flush_all()
+                if write_buffer is not None:
+                    await write_buffer.stop()
+                await generation_executor.stop()
+                if mongo_client is None:
+                    client.close()
+        finally:
+            running_app = None
+
+    # Create the main app without a prefix
+    app = FastAPI(default_response_class=FastJSONResponse, lifespan=lifespan)
+
+    # Include the router in the main app
+    app.include_router(api_router)
+    app.add_api_route("/metrics", get_metrics, include_in_schema=False)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+app = create_app()
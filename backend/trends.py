@@ -0,0 +1,117 @@
+# Session trends - running per-session aggregates of the saved energy values, kept on the sessions document
+
+import os
+
+import numpy as np
+
+from energy_codec import energy_array, energy_values
+from profile_generator import CHAKRA_KEYS, ENERGY_FIELDS, analyze_energy_centers, analyze_energy_values
+
+# Weight of the newest profile in the exponentially weighted moving averages
+TREND_EWMA_ALPHA = float(os.environ.get('TREND_EWMA_ALPHA', '0.3'))
+
+# Tracked series: every chakra value, then the generated overallBalance
+SERIES = (*(f"{key}.{field}" for key in CHAKRA_KEYS for field in ENERGY_FIELDS), "overallBalance")
+
+
+def _series_rows(documents):
+    """
+    The tracked values of each of the given profile documents, as lists of ints in SERIES order
+    """
+    if len(documents) == 1:
+        # One profile is cheaper in plain Python than through the array path
+        values = energy_values(documents[0]["energyCenters"])
+        return [[*values, analyze_energy_values(values)[0]]]
+    values = np.stack([energy_array(document["energyCenters"]) for document in documents])
+    overall_balance = analyze_energy_centers(values).overall_balance
+    return np.column_stack([values.reshape(len(documents), -1).astype(np.int64), overall_balance]).tolist()
+
+
+def _paths(series):
+    # Field set and current stored value of each aggregate of one series, then the last value's field
+    paths = []
+    for field in ("sum", "min", "max", "ewma"):
+        paths += [f"trends.{series}.{field}", f"$trends.{series}.{field}"]
+    return (*paths, f"trends.{series}.last")
+
+
+SERIES_PATHS = tuple(_paths(series) for series in SERIES)
+
+
+def _group_columns(rows, alpha):
+    """
+    Per series: sum, min, max, first and last value of `rows` (oldest first), and the part of
+    the moving average they add once the stored average has decayed by (1 - alpha) ** len(rows)
+    """
+    if len(rows) == 1:
+        row = rows[0]
+        return row, row, row, row, row, [alpha * value for value in row]
+    values = np.asarray(rows, dtype=np.int64)
+    # Weight of each new value in the moving average after all of them are applied
+    weights = alpha * (1.0 - alpha) ** np.arange(len(rows) - 1, -1, -1)
+    return (
+        values.sum(axis=0).tolist(), values.min(axis=0).tolist(), values.max(axis=0).tolist(),
+        rows[0], rows[-1], (weights @ values.astype(np.float64)).tolist()
+    )
+
+
+def _trend_fields(rows, alpha):
+    count = len(rows)
+    decay = (1.0 - alpha) ** count
+    sums, minimums, maximums, firsts, lasts, contributions = _group_columns(rows, alpha)
+
+    fields = {"trends.count": {"$add": [{"$ifNull": ["$trends.count", 0]}, count]}}
+    for paths, total, minimum, maximum, first, last, contribution in zip(
+        SERIES_PATHS, sums, minimums, maximums, firsts, lasts, contributions
+    ):
+        (sum_field, sum_current, min_field, min_current, max_field, max_current,
+         ewma_field, ewma_current, last_field) = paths
+        fields[sum_field] = {"$add": [{"$ifNull": [sum_current, 0]}, total]}
+        fields[min_field] = {"$min": [{"$ifNull": [min_current, first]}, minimum]}
+        fields[max_field] = {"$max": [{"$ifNull": [max_current, first]}, maximum]}
+        fields[last_field] = last
+        fields[ewma_field] = {"$add": [{"$multiply": [{"$ifNull": [ewma_current, first]}, decay]}, contribution]}
+    return fields
+
+
+def session_trend_fields(documents, alpha=TREND_EWMA_ALPHA):
+    """
+    Per sessionId, the fields of an update pipeline $set stage folding that session's profiles
+    among `documents` (oldest first) into its trends. Sums, minimums and maximums are combined
+    with the stored ones; the moving averages decay the stored value once per profile and are
+    seeded with the first value a session saved.
+    """
+    rows = _series_rows(documents)
+    groups = {}
+    for document, row in zip(documents, rows):
+        groups.setdefault(document["sessionId"], []).append(row)
+    return {session_id: _trend_fields(group, alpha) for session_id, group in groups.items()}
+
+
+def read_trends(session, alpha=TREND_EWMA_ALPHA):
+    """
+    API view of the trends stored on a session document (None or without trends for none)
+    """
+    trends = (session or {}).get("trends") or {}
+    count = trends.get("count", 0)
+
+    def view(series):
+        if not series or not count:
+            return None
+        return {
+            "mean": round(series["sum"] / count, 2),
+            "min": series["min"],
+            "max": series["max"],
+            "last": series["last"],
+            "ewma": round(series["ewma"], 2)
+        }
+
+    return {
+        "count": count,
+        "ewmaAlpha": alpha,
+        "chakras": {
+            key: {field: view(trends.get(key, {}).get(field)) for field in ENERGY_FIELDS}
+            for key in CHAKRA_KEYS
+        } if count else {},
+        "overallBalance": view(trends.get("overallBalance"))
+    }
@@ -0,0 +1,134 @@
+# Write-behind buffer - coalesces profile inserts into batched Mongo writes
+
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteQueueFull(Exception):
+    """
+    Raised when a document could not be queued before the put timeout expired
+    """
+
+
+class WriteBehindBuffer:
+    """
+    Bounded queue of documents drained into batched writes by a background task.
+
+    `sink` is an async callable taking a list of documents and returning the failed
+    positions (or None). A batch is flushed when it reaches `max_batch` documents or
+    `flush_interval` seconds after its first document was queued, whichever comes first.
+    """
+
+    def __init__(self, sink, max_queue=10000, max_batch=500, flush_interval=0.05, put_timeout=1.0):
+        self._sink = sink
+        self._max_batch = max_batch
+        self._flush_interval = flush_interval
+        self._put_timeout = put_timeout
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._batch_ready = asyncio.Event()
+        self._task = None
+
+        self.flushes = 0
+        self.flushed_documents = 0
+        self.failed_documents = 0
+        self.rejected_documents = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """
+        Flush everything still queued, then stop the background task
+        """
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        self._batch_ready.set()
+        await self._task
+        self._task = None
+
+    async def put(self, document):
+        """
+        Queue a document, waiting up to put_timeout for space (backpressure)
+        """
+        if not self.running:
+            raise RuntimeError('Write-behind buffer is not running')
+        try:
+            self._queue.put_nowait(document)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put(document), self._put_timeout)
+            except asyncio.TimeoutError:
+                self.rejected_documents += 1
+                raise WriteQueueFull(f'Write queue is full ({self._queue.maxsize} documents)')
+        if self._queue.qsize() >= self._max_batch:
+            self._batch_ready.set()
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch = [await self._queue.get()]
+            if self._queue.qsize() + 1 < self._max_batch:
+                self._batch_ready.clear()
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), self._flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self._max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            if _STOP in batch:
+                stopping = True
+                batch = [document for document in batch if document is not _STOP]
+                # Drain whatever was queued behind the stop marker as well
+                while not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+
+            for start in range(0, len(batch), self._max_batch):
+                await self._write(batch[start:start + self._max_batch])
+
+    async def _write(self, batch):
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            failed = await self._sink(batch)
+            failed_count = len(failed or ())
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} buffered profiles: {str(e)}")
+            failed_count = len(batch)
+        elapsed = time.perf_counter() - started
+
+        self.flushes += 1
+        self.flushed_documents += len(batch) - failed_count
+        self.failed_documents += failed_count
+        self.last_flush_seconds = elapsed
+        self.total_flush_seconds += elapsed
+        self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'queueDepth': self._queue.qsize(),
+            'maxQueue': self._queue.maxsize,
+            'flushes': self.flushes,
+            'flushedDocuments': self.flushed_documents,
+            'failedDocuments': self.failed_documents,
+            'rejectedDocuments': self.rejected_documents,
+            'lastFlushSeconds': self.last_flush_seconds,
+            'avgFlushSeconds': self.total_flush_seconds / self.flushes if self.flushes else 0.0,
+            'maxFlushSeconds': self.max_flush_seconds
+        }
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end load test of the API with a realistic traffic mix.
+
+Virtual users each own a session and loop over weighted scenarios: slider bursts (a run of
+POST /api/profiles while one value is dragged), history reads, session stats reads and reads
+of a profile saved earlier. The app runs in-process against an in-memory MongoDB stand-in
+(needs mongomock-motor) or a local mongod, or a running server is targeted with --url.
+Requests go through httpx (pip install httpx mongomock-motor).
+
+    python benchmarks/loadtest.py                                   # in-process, in-memory database
+    python benchmarks/loadtest.py --mongo-url mongodb://localhost:27017 --users 200 --duration 60
+    python benchmarks/loadtest.py --url http://localhost:8001       # a running uvicorn
+    python benchmarks/loadtest.py --env SESSION_RATE_LIMIT=0 --mix slider=1
+
+Reports throughput, p50/p95/p99 latency, error and rejection (429/503) rates per endpoint.
+Exits with status 1 when the error rate or a p99 goes over --max-error-rate or --max-p99-ms.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
+
+CHAKRA_KEYS = ("root", "sacral", "solarPlexus", "heart", "throat", "thirdEye", "crown")
+ENERGY_FIELDS = ("frequency", "balance", "blockage")
+
+# Scenarios a virtual user picks from, with their weights in the default traffic mix
+SCENARIOS = ("slider", "history", "stats", "by_id")
+DEFAULT_MIX = "slider=0.5,history=0.2,stats=0.2,by_id=0.1"
+
+# Statuses the admission control answers with when the API sheds load
+REJECTED_STATUSES = (429, 503)
+
+
+def random_energy_centers(rng):
+    return {
+        key: {field: rng.randint(0, 100) for field in ENERGY_FIELDS}
+        for key in CHAKRA_KEYS
+    }
+
+
+def parse_mix(text):
+    """
+    Scenario name -> weight from "name=weight,..."
+    """
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"Unknown scenario {name.strip()!r}, expected one of {', '.join(SCENARIOS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Recorder:
+    """
+    Latencies and outcomes per endpoint
+    """
+
+    def __init__(self):
+        self.endpoints = {}
+
+    def record(self, endpoint, seconds, status):
+        entry = self.endpoints.setdefault(endpoint, {'latencies': [], 'errors': 0, 'rejected': 0, 'statuses': {}})
+        entry['latencies'].append(seconds)
+        entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+        if status in REJECTED_STATUSES:
+            entry['rejected'] += 1
+        elif not isinstance(status, int) or status >= 400:
+            entry['errors'] += 1
+
+    def summary(self, elapsed):
+        results = {}
+        for endpoint, entry in sorted(self.endpoints.items()):
+            latencies = sorted(entry['latencies'])
+            count = len(latencies)
+            results[endpoint] = {
+                'requests': count,
+                'rps': count / elapsed,
+                'p50Ms': percentile(latencies, 0.50) * 1e3,
+                'p95Ms': percentile(latencies, 0.95) * 1e3,
+                'p99Ms': percentile(latencies, 0.99) * 1e3,
+                'errorRate': entry['errors'] / count,
+                'rejectedRate': entry['rejected'] / count,
+                'statuses': {str(status): number for status, number in sorted(entry['statuses'].items(), key=str)}
+            }
+        return results
+
+
+class VirtualUser:
+    """
+    One browser session: its current slider values and the profiles it saved
+    """
+
+    def __init__(self, http, recorder, rng, think_time, key_share):
+        self.http = http
+        self.recorder = recorder
+        self.rng = rng
+        self.think_time = think_time
+        self.key_share = key_share
+        self.session_id = f"loadtest-{uuid.uuid4()}"
+        self.energy_centers = random_energy_centers(rng)
+        self.profile_ids = []
+
+    async def request(self, endpoint, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, path, **kwargs)
+            status = response.status_code
+        except Exception as e:
+            response, status = None, type(e).__name__
+        self.recorder.record(endpoint, time.perf_counter() - started, status)
+        return response
+
+    async def save(self):
+        # The frontend sends no Idempotency-Key; --idempotency-key-share models other clients that do
+        headers = {"Idempotency-Key": str(uuid.uuid4())} if self.rng.random() < self.key_share else {}
+        response = await self.request(
+            "POST /api/profiles", "POST", "/api/profiles",
+            json={"sessionId": self.session_id, "energyCenters": self.energy_centers},
+            headers=headers
+        )
+        if response is not None and response.status_code == 200:
+            self.profile_ids.append(response.json()["profileId"])
+
+    async def slider(self):
+        key, field = self.rng.choice(CHAKRA_KEYS), self.rng.choice(ENERGY_FIELDS)
+        step = self.rng.choice((-1, 1)) * self.rng.randint(1, 5)
+        for _ in range(self.rng.randint(3, 15)):
+            value = self.energy_centers[key][field] + step
+            self.energy_centers[key][field] = max(0, min(100, value))
+            await self.save()
+            await asyncio.sleep(self.think_time / 5)
+
+    async def history(self):
+        await self.request("GET /api/profiles/{session_id}", "GET", f"/api/profiles/{self.session_id}")
+
+    async def stats(self):
+        await self.request("GET /api/sessions/{session_id}/stats", "GET", f"/api/sessions/{self.session_id}/stats")
+
+    async def by_id(self):
+        if not self.profile_ids:
+            return await self.slider()
+        profile_id = self.rng.choice(self.profile_ids)
+        await self.request("GET /api/profiles/profile/{profile_id}", "GET", f"/api/profiles/profile/{profile_id}")
+
+    async def run(self, mix, deadline):
+        names, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rng.choices(names, weights)[0])()
+            await asyncio.sleep(self.rng.uniform(0, 2 * self.think_time))
+
+
+def _use_sparse_indexes():
+    """
+    mongomock ignores partialFilterExpression, so the partial unique indexes on keys only some
+    profiles carry would reject the second profile without one. For single-field indexes filtered
+    on {field: {"$exists": True}} a sparse index is the same thing, and mongomock honours that.
+    """
+    from pymongo import IndexModel
+
+    import indexes
+
+    for models in indexes.INDEXES.values():
+        for position, model in enumerate(models):
+            document = dict(model.document)
+            partial = document.pop("partialFilterExpression", None)
+            if partial is None:
+                continue
+            keys = list(document.pop("key").items())
+            if len(keys) != 1 or partial != {keys[0][0]: {"$exists": True}}:
+                raise RuntimeError(f"Index {document['name']} can't be served by the in-memory database, use --mongo-url")
+            models[position] = IndexModel(keys, sparse=True, **document)
+
+
+@asynccontextmanager
+async def http_client(args):
+    """
+    httpx client for a running server (--url) or for the app served in-process
+    """
+    try:
+        import httpx
+    except ImportError:
+        raise RuntimeError("The load test needs httpx (pip install httpx)")
+    # One log line per request would cost more than serving it
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as http:
+            yield http
+        return
+
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        mongo_client = AsyncIOMotorClient(args.mongo_url)
+    else:
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            raise RuntimeError("The in-memory database needs mongomock-motor (pip install mongomock-motor), "
+                               "or pass --mongo-url or --url")
+        mongo_client = AsyncMongoMockClient()
+        _use_sparse_indexes()
+
+    # The server reads its configuration when it is imported
+    import server
+
+    app = server.create_app(mongo_client, args.db_name)
+    try:
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as http:
+                yield http
+    finally:
+        if args.mongo_url:
+            if not args.keep_data:
+                await mongo_client.drop_database(args.db_name)
+            mongo_client.close()
+
+
+async def run_load(args):
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    async with http_client(args) as http:
+        users = [VirtualUser(http, recorder, random.Random(rng.random()), args.think_time,
+                             args.idempotency_key_share) for _ in range(args.users)]
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(user.run(args.mix, deadline) for user in users))
+        elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed), elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='base URL of a running server; by default the app runs in-process')
+    parser.add_argument('--mongo-url', help='MongoDB for the in-process app; by default an in-memory stand-in')
+    parser.add_argument('--db-name', default='energy_loadtest',
+                        help='database of the in-process app, dropped afterwards on --mongo-url (default energy_loadtest)')
+    parser.add_argument('--keep-data', action='store_true', help="don't drop the --mongo-url database afterwards")
+    parser.add_argument('--users', type=int, default=50, help='concurrent virtual users (default 50)')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to generate load (default 10)')
+    parser.add_argument('--think-time', type=float, default=0.1,
+                        help='mean seconds between scenarios, slider steps are a fifth of it (default 0.1)')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX, help=f'scenario weights (default {DEFAULT_MIX})')
+    parser.add_argument('--idempotency-key-share', type=float, default=0.0,
+                        help='share of saves sending a fresh Idempotency-Key; the frontend sends none (default 0)')
+    parser.add_argument('--timeout', type=float, default=10.0, help='request timeout in seconds (default 10)')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the generated traffic')
+    parser.add_argument('--env', action='append', default=[], metavar='NAME=VALUE',
+                        help='server setting for the in-process app, e.g. SESSION_RATE_LIMIT=0 (repeatable)')
+    parser.add_argument('--json', type=Path, help='also write the results to this JSON file')
+    parser.add_argument('--max-error-rate', type=float, default=0.01,
+                        help='allowed share of failed requests per endpoint, rejections excluded (default 0.01)')
+    parser.add_argument('--max-p99-ms', type=float, help='allowed p99 latency per endpoint in milliseconds')
+    args = parser.parse_args(argv)
+
+    for setting in args.env:
+        name, _, value = setting.partition('=')
+        os.environ[name] = value
+    # mongomock can't explain queries, so the startup index plan check has nothing to verify
+    if not args.url and not args.mongo_url:
+        os.environ.setdefault('INDEX_PLAN_CHECK', 'off')
+
+    results, elapsed = asyncio.run(run_load(args))
+
+    failed = []
+    print(f"{'endpoint':<40} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'rejected':>9}")
+    for endpoint, result in results.items():
+        over = result['errorRate'] > args.max_error_rate or (
+            args.max_p99_ms is not None and result['p99Ms'] > args.max_p99_ms
+        )
+        if over:
+            failed.append(endpoint)
+        print(f"{endpoint:<40} {result['requests']:>9,} {result['rps']:>9,.1f} {result['p50Ms']:>8.2f} "
+              f"{result['p95Ms']:>8.2f} {result['p99Ms']:>8.2f} {result['errorRate']:>7.2%} "
+              f"{result['rejectedRate']:>9.2%}{'  FAILED' if over else ''}")
+    total = sum(result['requests'] for result in results.values())
+    print(f"{total:,} requests in {elapsed:.1f}s ({total / elapsed:,.1f} req/s) from {args.users} users")
+
+    if args.json:
+        args.json.write_text(json.dumps({
+            'createdAt': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'target': args.url or ('in-process, ' + ('mongod' if args.mongo_url else 'in-memory database')),
+            'users': args.users,
+            'durationSeconds': elapsed,
+            'mix': args.mix,
+            'results': results
+        }, indent=2) + '\n')
+        print(f"Saved results to {args.json}")
+
+    if failed:
+        print(f"{len(failed)} endpoint(s) over the error rate or latency limits: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
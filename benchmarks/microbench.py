@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Offline microbenchmarks for the profile generation hot path.
+
+Covers profile generation over randomized and adversarial inputs, next to the original dict-walk
+generator (tests/baseline_profile_generator.py) as a reference, ProfileRequest and fast path parsing,
+the energy centers conversion done by create_profile and JSON encoding of responses.
+No database or network is needed.
+
+    python benchmarks/microbench.py                 # run and compare against the baseline
+    python benchmarks/microbench.py --save          # run and store the results as the new baseline
+    python benchmarks/microbench.py -k generate     # only benchmarks whose name contains "generate"
+
+Exits with status 1 when a benchmark's ops/sec drops more than --threshold below the baseline.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT_DIR / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(ROOT_DIR))
+
+import numpy as np  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from starlette.responses import JSONResponse  # noqa: E402
+
+import server  # noqa: E402
+from fast_ingest import parse_profile_request  # noqa: E402
+from fast_json import FastJSONResponse  # noqa: E402
+from profile_generator import (  # noqa: E402
+    CHAKRA_KEYS, ENERGY_FIELDS, energy_centers_to_array, generate_spiritual_profile, generate_spiritual_profiles,
+    lookup_profile
+)
+from tests.baseline_profile_generator import generate_spiritual_profile as baseline_spiritual_profile  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+# Values sitting on every threshold of the rule set, used for the adversarial inputs
+BOUNDARY_VALUES = (0, 39, 40, 41, 49, 50, 51, 59, 60, 61, 69, 70, 71, 79, 80, 81, 100)
+
+
+def random_energy_centers(rng):
+    return {
+        key: {field: rng.randint(0, 100) for field in ENERGY_FIELDS}
+        for key in CHAKRA_KEYS
+    }
+
+
+def adversarial_energy_centers(rng):
+    """
+    Boundary values and ties between chakras, which exercise every branch and tie-break
+    """
+    shape = rng.randrange(4)
+    if shape == 0:
+        value = rng.choice(BOUNDARY_VALUES)
+        return {key: {field: value for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}
+    if shape == 1:
+        return {key: {field: rng.choice((0, 100)) for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}
+    return {
+        key: {field: rng.choice(BOUNDARY_VALUES) for field in ENERGY_FIELDS}
+        for key in CHAKRA_KEYS
+    }
+
+
+def history_documents(rng, count=50):
+    """
+    Documents shaped like a GET /api/profiles/{session_id} page
+    """
+    created_at = datetime(2024, 1, 1, 12, 0, 0, 123000)
+    documents = []
+    for index in range(count):
+        energy_centers = random_energy_centers(rng)
+        documents.append({
+            "_id": f"{index:024x}",
+            "sessionId": "benchmark-session",
+            "energyCenters": energy_centers,
+            "generatedProfile": generate_spiritual_profile(energy_centers),
+            "ruleVersion": "benchmark",
+            "createdAt": created_at - timedelta(minutes=index),
+            "updatedAt": created_at - timedelta(minutes=index)
+        })
+    return documents
+
+
+def build_benchmarks(seed):
+    """
+    Returns (name, ops per call, function) for every benchmark; inputs are pregenerated
+    """
+    rng = random.Random(seed)
+    random_inputs = [random_energy_centers(rng) for _ in range(1000)]
+    adversarial_inputs = [adversarial_energy_centers(rng) for _ in range(1000)]
+    batch_array = np.stack([energy_centers_to_array(centers) for centers in random_inputs])
+    request_bodies = [
+        json.dumps({"sessionId": f"session-{index}", "energyCenters": centers}).encode()
+        for index, centers in enumerate(random_inputs)
+    ]
+    parsed_requests = [server.ProfileRequest.parse_raw(body) for body in request_bodies]
+    cached_profiles = [lookup_profile(centers) for centers in random_inputs]
+    generated_profiles = [generate_spiritual_profile(centers) for centers in random_inputs]
+    history = {"success": True, "sessionId": "benchmark-session", "profiles": history_documents(rng)}
+
+    def cycle(items):
+        state = {'index': 0}
+
+        def next_item():
+            state['index'] = (state['index'] + 1) % len(items)
+            return items[state['index']]
+        return next_item
+
+    next_random = cycle(random_inputs)
+    next_adversarial = cycle(adversarial_inputs)
+    next_body = cycle(request_bodies)
+    next_request = cycle(parsed_requests)
+    next_cached = cycle(cached_profiles)
+    next_generated = cycle(generated_profiles)
+
+    return [
+        ('baseline_spiritual_profile[random]', 1,
+         lambda: baseline_spiritual_profile(next_random())),
+        ('baseline_spiritual_profile[adversarial]', 1,
+         lambda: baseline_spiritual_profile(next_adversarial())),
+        ('generate_spiritual_profile[random]', 1,
+         lambda: generate_spiritual_profile(next_random())),
+        ('generate_spiritual_profile[adversarial]', 1,
+         lambda: generate_spiritual_profile(next_adversarial())),
+        ('generate_spiritual_profiles[batch=1000]', len(batch_array),
+         lambda: generate_spiritual_profiles(batch_array)),
+        ('lookup_profile[random]', 1,
+         lambda: lookup_profile(next_random())),
+        ('ProfileRequest.parse', 1,
+         lambda: server.ProfileRequest.parse_obj(json.loads(next_body()))),
+        ('parse_profile_request[fast path]', 1,
+         lambda: parse_profile_request(next_body())),
+        ('energy_centers_dict', 1,
+         lambda: server._energy_centers_dict(next_request().energyCenters)),
+        ('encode[create response, json]', 1,
+         lambda: JSONResponse(jsonable_encoder({
+             "success": True, "sessionId": "benchmark-session", "profileId": "0" * 24,
+             "profile": next_generated()
+         })).body),
+        ('encode[create response, pre-encoded]', 1,
+         lambda: server._profile_response("benchmark-session", "0" * 24, next_cached()[1]).body),
+        ('encode[history page of 50]', 1,
+         lambda: JSONResponse(jsonable_encoder(history)).body),
+        ('encode[history page of 50, orjson]', 1,
+         lambda: FastJSONResponse(history).body),
+    ]
+
+
+def run_benchmark(function, ops_per_call, duration, min_samples=50):
+    """
+    Time `function` in samples of several calls and return ops/sec plus p50/p99 per-op latency
+    """
+    # Warm up and pick a number of calls per sample that takes roughly 1ms
+    started = time.perf_counter()
+    calls = 0
+    while time.perf_counter() - started < min(0.1, duration / 10):
+        function()
+        calls += 1
+    per_call = (time.perf_counter() - started) / calls
+    calls_per_sample = max(1, int(0.001 / per_call))
+
+    samples = []
+    total_time = 0.0
+    while total_time < duration or len(samples) < min_samples:
+        sample_started = time.perf_counter()
+        for _ in range(calls_per_sample):
+            function()
+        elapsed = time.perf_counter() - sample_started
+        total_time += elapsed
+        samples.append(elapsed / (calls_per_sample * ops_per_call))
+
+    samples.sort()
+    total_ops = len(samples) * calls_per_sample * ops_per_call
+    return {
+        'opsPerSec': total_ops / total_time,
+        'p50Us': samples[len(samples) // 2] * 1e6,
+        'p99Us': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+        'samples': len(samples)
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Return the names of benchmarks whose ops/sec fell more than `threshold` below the baseline
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            result['change'] = None
+            continue
+        change = result['opsPerSec'] / previous['opsPerSec'] - 1
+        result['change'] = change
+        if change < -threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=1.0, help='seconds to run each benchmark (default 1.0)')
+    parser.add_argument('--seed', type=int, default=1, help='seed for the generated inputs')
+    parser.add_argument('-k', '--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='allowed ops/sec drop against the baseline before failing (default 0.10)')
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+
+    results = {}
+    for name, ops_per_call, function in build_benchmarks(args.seed):
+        if args.filter not in name:
+            continue
+        results[name] = run_benchmark(function, ops_per_call, args.duration)
+
+    regressions = compare(results, baseline, args.threshold)
+    print(f"{'benchmark':<42} {'ops/sec':>12} {'p50 us':>10} {'p99 us':>10} {'vs base':>9}")
+    for name, result in results.items():
+        change = '' if result['change'] is None else f"{result['change']:+.1%}"
+        flag = '  REGRESSION' if name in regressions else ''
+        print(f"{name:<42} {result['opsPerSec']:>12,.0f} {result['p50Us']:>10.2f} {result['p99Us']:>10.2f} {change:>9}{flag}")
+
+    if args.save:
+        args.baseline.write_text(json.dumps({
+            'createdAt': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'results': {name: {key: value for key, value in result.items() if key != 'change'}
+                        for name, result in results.items()}
+        }, indent=2) + '\n')
+        print(f"Saved baseline to {args.baseline}")
+
+    if regressions and not args.save:
+        print(f"{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%} against {args.baseline}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
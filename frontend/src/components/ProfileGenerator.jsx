@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
 import EnergyCenter from './EnergyCenter';
 import DescriptionPanel from './DescriptionPanel';
@@ -6,7 +6,7 @@ import ChakraVisualization from './ChakraVisualization';
 import OverallMetrics from './OverallMetrics';
 import ProfileHistory from './ProfileHistory';
 import ChakraQuestionnaire from './ChakraQuestionnaire';
-import { generateProfile } from '../services/api';
+import { generateProfile, openProfilePreview } from '../services/api';
 import { Loader2, Save, History, RotateCcw } from 'lucide-react';
 import { Button } from './ui/button';
 import { useToast } from '../hooks/use-toast';
@@ -27,6 +27,8 @@ const ProfileGenerator = () => {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [showHistory, setShowHistory] = useState(false);
+  const [previewOpen, setPreviewOpen] = useState(false);
+  const previewRef = useRef(null);
   const { toast } = useToast();
 
   const chakraData = [
@@ -122,16 +124,43 @@ const ProfileGenerator = () => {
     }));
   };
 
-  // Debounced profile generation
+  // Live preview connection; without it every change falls back to a POST
   useEffect(() => {
-    if (!showQuestionnaire) {
-      const timeoutId = setTimeout(() => {
-        generateNewProfile();
-      }, 500); // 500ms delay
+    if (showQuestionnaire || typeof WebSocket === 'undefined') {
+      return undefined;
+    }
+    const preview = openProfilePreview({
+      onProfile: (newProfile) => {
+        setProfile(newProfile);
+        setError(null);
+      },
+      onError: (err) => console.error('Profile preview error:', err),
+      onStatusChange: setPreviewOpen
+    });
+    previewRef.current = preview;
 
-      return () => clearTimeout(timeoutId);
+    return () => {
+      previewRef.current = null;
+      preview.close();
+    };
+  }, [showQuestionnaire]);
+
+  // Previews are cheap over the socket, the POST fallback is debounced
+  useEffect(() => {
+    if (showQuestionnaire) {
+      return undefined;
     }
-  }, [energyCenters, showQuestionnaire]);
+    const preview = previewRef.current;
+    if (previewOpen && preview && preview.isOpen()) {
+      preview.update(energyCenters);
+      return undefined;
+    }
+    const timeoutId = setTimeout(() => {
+      generateNewProfile();
+    }, 500); // 500ms delay
+
+    return () => clearTimeout(timeoutId);
+  }, [energyCenters, showQuestionnaire, previewOpen]);
 
   const generateNewProfile = async () => {
     try {
@@ -158,7 +187,12 @@ const ProfileGenerator = () => {
   const saveProfile = async () => {
     try {
       setLoading(true);
-      await generateProfile(energyCenters);
+      const preview = previewRef.current;
+      if (preview && preview.isOpen()) {
+        await preview.save(energyCenters);
+      } else {
+        await generateProfile(energyCenters);
+      }
       
       toast({
         title: "Profile Saved",
@@ -95,4 +95,62 @@ export const getSessionStats = async () => {
   }
 };
 
+// Live preview over one WebSocket: profiles are generated in memory on every update and
+// nothing is stored until save(). Replies echo the seq of the message they answer.
+export const openProfilePreview = ({ onProfile, onSaved, onError, onStatusChange } = {}) => {
+  const url = new URL(`${API_BASE}/ws/profile`, window.location.href);
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+  url.searchParams.set('sessionId', getSessionId());
+
+  const socket = new WebSocket(url.toString());
+  const pendingSaves = new Map();
+  let seq = 0;
+  let latestUpdate = 0;
+
+  socket.onopen = () => onStatusChange && onStatusChange(true);
+  socket.onclose = () => {
+    pendingSaves.forEach(({ reject }) => reject(new Error('Preview connection closed')));
+    pendingSaves.clear();
+    onStatusChange && onStatusChange(false);
+  };
+  socket.onmessage = (event) => {
+    const message = JSON.parse(event.data);
+    const save = pendingSaves.get(message.seq);
+    if (save) {
+      pendingSaves.delete(message.seq);
+      if (message.type === 'saved') {
+        save.resolve(message);
+        onSaved && onSaved(message);
+      } else {
+        save.reject(new Error(message.detail));
+      }
+    } else if (message.type === 'profile') {
+      // Skip replies overtaken by a newer update
+      if (message.seq === latestUpdate && onProfile) onProfile(message.profile);
+    } else if (message.type === 'error' && onError) {
+      onError(new Error(message.detail));
+    }
+  };
+
+  const isOpen = () => socket.readyState === WebSocket.OPEN;
+
+  return {
+    isOpen,
+    update: (energyCenters) => {
+      latestUpdate = ++seq;
+      socket.send(JSON.stringify({ type: 'update', seq: latestUpdate, energyCenters }));
+    },
+    save: (energyCenters) => new Promise((resolve, reject) => {
+      const saveSeq = ++seq;
+      pendingSaves.set(saveSeq, { resolve, reject });
+      if (energyCenters) {
+        latestUpdate = ++seq;
+        socket.send(JSON.stringify({ type: 'update', seq: latestUpdate, energyCenters }));
+      }
+      socket.send(JSON.stringify({ type: 'save', seq: saveSeq }));
+    }),
+    close: () => socket.close()
+  };
+};
+
 export { getSessionId };
\ No newline at end of file
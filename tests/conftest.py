@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Backend modules are imported flat, the way server.py imports them
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
@@ -0,0 +1,134 @@
+import pytest
+
+from admission import SessionRateLimiter, WriteLimiter, retry_after
+from idempotency import SaveCache
+from profile_generator import CHAKRA_KEYS, ENERGY_FIELDS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _limiter(rate=2, burst=3, max_keys=100):
+    clock = FakeClock()
+    return SessionRateLimiter(rate, burst, max_keys=max_keys, clock=clock), clock
+
+
+def test_burst_is_allowed_then_refused():
+    limiter, _ = _limiter(rate=2, burst=3)
+    assert [limiter.acquire("s") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("s") == pytest.approx(0.5)
+    assert limiter.acquire("other") == 0.0
+    assert limiter.stats()["allowed"] == 4 and limiter.stats()["rejected"] == 1
+
+
+def test_tokens_refill_at_rate():
+    limiter, clock = _limiter(rate=2, burst=3)
+    for _ in range(3):
+        limiter.acquire("s")
+
+    clock.now += 0.25
+    assert limiter.acquire("s") == pytest.approx(0.25)
+    clock.now += 0.25
+    assert limiter.acquire("s") == 0.0
+    assert limiter.acquire("s") == pytest.approx(0.5)
+
+    # Idle long enough to refill the whole burst, but never beyond it
+    clock.now += 60
+    assert [limiter.acquire("s") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("s") > 0
+
+
+def test_refused_saves_do_not_use_tokens():
+    limiter, clock = _limiter(rate=1, burst=1)
+    limiter.acquire("s")
+    for _ in range(5):
+        assert limiter.acquire("s") == pytest.approx(1.0)
+    clock.now += 1
+    assert limiter.acquire("s") == 0.0
+
+
+@pytest.mark.parametrize("wait, header", [(0.01, "1"), (0.5, "1"), (1.0, "1"), (1.2, "2"), (9.99, "10")])
+def test_retry_after_rounds_up_to_whole_seconds(wait, header):
+    assert retry_after(wait) == header
+
+
+def test_retry_after_matches_the_next_token():
+    limiter, clock = _limiter(rate=0.5, burst=1)
+    limiter.acquire("s")
+    clock.now += 0.5
+    wait = limiter.acquire("s")
+    assert retry_after(wait) == "2"
+    clock.now += 1.5
+    assert limiter.acquire("s") == 0.0
+
+
+def test_idle_buckets_expire():
+    limiter, clock = _limiter(rate=1, burst=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    clock.now += 10
+    limiter.acquire("c")
+    assert limiter.stats()["trackedSessions"] == 1
+    assert limiter.stats()["evicted"] == 0
+
+
+def test_least_recently_used_buckets_are_evicted_at_max_keys():
+    limiter, _ = _limiter(rate=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key)
+    stats = limiter.stats()
+    assert stats["trackedSessions"] == 2 and stats["evicted"] == 1
+
+    # "a" was dropped, so it starts over with a full bucket; "c" is still empty
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("c") > 0
+
+
+def test_write_limiter_caps_in_flight_writes():
+    limiter = WriteLimiter(2)
+    assert limiter.try_acquire() and limiter.try_acquire()
+    assert not limiter.try_acquire()
+    assert limiter.stats() == {"limit": 2, "inFlight": 2, "rejected": 1}
+
+    limiter.release()
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+    limiter.release()
+    limiter.release()
+    assert limiter.stats() == {"limit": 2, "inFlight": 0, "rejected": 2}
+
+
+@pytest.fixture
+def limited_app(monkeypatch):
+    # Only the endpoint test needs the in-memory database, the limiter tests run without it
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    testclient = pytest.importorskip("fastapi.testclient")
+    import server
+
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["admission_test"])
+    monkeypatch.setattr(server, "save_cache", SaveCache())
+    monkeypatch.setattr(server, "save_debouncer", None)
+    monkeypatch.setattr(server, "write_buffer", None)
+    monkeypatch.setattr(server, "session_rate_limiter", SessionRateLimiter(0.001, 2, clock=FakeClock()))
+    return testclient.TestClient(server.app)
+
+
+def _body(value, session_id=None):
+    body = {"energyCenters": {key: {field: value for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}}
+    if session_id is not None:
+        body["sessionId"] = session_id
+    return body
+
+
+def test_anonymous_saves_are_rate_limited(limited_app):
+    statuses = [limited_app.post("/api/profiles", json=_body(value)).status_code for value in (10, 20, 30)]
+    assert statuses == [200, 200, 429]
+    assert limited_app.post("/api/profiles", json=_body(40)).headers["Retry-After"] == "1000"
+
+    # Sessions have buckets of their own
+    assert limited_app.post("/api/profiles", json=_body(50, session_id="named")).status_code == 200
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from idempotency import SaveCache
+from profile_generator import CHAKRA_KEYS
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+testclient = pytest.importorskip("fastapi.testclient")
+
+import server  # noqa: E402
+from regenerate import regenerate_profiles  # noqa: E402
+
+ENERGY_CENTERS = {key: {"frequency": 70, "balance": 60, "blockage": 30} for key in CHAKRA_KEYS}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["conditional_get_test"])
+    monkeypatch.setattr(server, "save_cache", SaveCache())
+    monkeypatch.setattr(server, "save_debouncer", None)
+    monkeypatch.setattr(server, "write_buffer", None)
+    return testclient.TestClient(server.app)
+
+
+def _revalidate(client, path, etag):
+    return client.get(path, headers={"If-None-Match": etag}).status_code
+
+
+def test_regeneration_invalidates_profile_and_session_tags(client):
+    profile_id = client.post("/api/profiles", json={"sessionId": "s", "energyCenters": ENERGY_CENTERS}).json()["profileId"]
+    by_id, history = f"/api/profiles/profile/{profile_id}", "/api/profiles/s"
+
+    profile = client.get(by_id)
+    assert "immutable" not in profile.headers["cache-control"]
+    profile_etag, history_etag = profile.headers["etag"], client.get(history).headers["etag"]
+    assert _revalidate(client, by_id, profile_etag) == 304
+    assert _revalidate(client, history, history_etag) == 304
+
+    # A profile stored under older rules, then rewritten by the job
+    asyncio.run(server.db.energy_profiles.update_one(
+        {"sessionId": "s"}, {"$set": {"ruleVersion": "0.9", "generatedProfile.overallLevel": "old"}}
+    ))
+    asyncio.run(regenerate_profiles(server.db, rate=0))
+
+    assert client.get(by_id).json()["profile"]["generatedProfile"]["overallLevel"] != "old"
+    assert _revalidate(client, by_id, profile_etag) == 200
+    assert _revalidate(client, history, history_etag) == 200
+
+
+def test_star_only_matches_existing_profiles(client):
+    profile_id = client.post("/api/profiles", json={"sessionId": "s", "energyCenters": ENERGY_CENTERS}).json()["profileId"]
+    assert _revalidate(client, f"/api/profiles/profile/{profile_id}", "*") == 304
+    assert _revalidate(client, f"/api/profiles/profile/{'0' * 24}", "*") == 404
+    assert _revalidate(client, "/api/profiles/profile/notanid", "*") == 404
+
+
+def test_profile_tag_names_the_rules_of_its_content(client):
+    profile_id = client.post("/api/profiles", json={"sessionId": "s", "energyCenters": ENERGY_CENTERS}).json()["profileId"]
+    by_id = f"/api/profiles/profile/{profile_id}"
+    assert f"-{server.RULE_VERSION}-" in client.get(by_id).headers["etag"]
+
+    # A full profile from older rules the job hasn't reached yet
+    asyncio.run(server.db.energy_profiles.update_one({"sessionId": "s"}, {"$set": {"ruleVersion": "0.9"}}))
+    response = client.get(by_id)
+    assert response.json()["profile"]["ruleVersion"] == "0.9" and "-0.9-" in response.headers["etag"]
+
+    # Inputs-only profiles are generated on read with the current rules
+    asyncio.run(server.db.energy_profiles.update_one({"sessionId": "s"}, {"$unset": {"generatedProfile": ""}}))
+    response = client.get(by_id)
+    assert response.json()["profile"]["ruleVersion"] == server.RULE_VERSION
+    assert f"-{server.RULE_VERSION}-" in response.headers["etag"]
@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+import server  # noqa: E402
+
+
+def test_only_one_app_runs_per_process():
+    async def run():
+        first = server.create_app(mongomock_motor.AsyncMongoMockClient(), "create_app_first")
+        second = server.create_app(mongomock_motor.AsyncMongoMockClient(), "create_app_second")
+        async with first.router.lifespan_context(first):
+            first_db = server.db
+            with pytest.raises(RuntimeError):
+                async with second.router.lifespan_context(second):
+                    pass
+            assert server.db is first_db
+        # Once the first app stopped another one can start
+        async with second.router.lifespan_context(second):
+            assert server.db.name == "create_app_second"
+
+    asyncio.run(run())
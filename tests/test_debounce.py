@@ -0,0 +1,63 @@
+import asyncio
+
+from debounce import SaveDebouncer
+
+
+class SlowSink:
+    """
+    Stores documents after `delay` seconds and reports the positions in `fail` as write errors
+    """
+
+    def __init__(self, delay=0.0, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.stored = []
+
+    async def __call__(self, documents):
+        await asyncio.sleep(self.delay)
+        self.stored.extend(document for position, document in enumerate(documents) if position not in self.fail)
+        return {position: "E11000 duplicate key" for position in self.fail if position < len(documents)}
+
+
+def test_flush_waits_for_settled_save_in_flight():
+    async def run():
+        sink = SlowSink(delay=0.05)
+        debouncer = SaveDebouncer(sink, window=0.01)
+        profile_id = debouncer.submit({"sessionId": "s", "value": 1})
+        await asyncio.sleep(0.02)  # settled, its save is now running
+        assert debouncer.stats()["pendingSessions"] == 0 and not sink.stored
+
+        await debouncer.flush_session("s")
+        assert [document["_id"] for document in sink.stored] == [profile_id]
+
+        profile_id = debouncer.submit({"sessionId": "s", "value": 2})
+        await asyncio.sleep(0.02)
+        await debouncer.flush_profile(profile_id)
+        assert sink.stored[-1]["_id"] == profile_id
+
+    asyncio.run(run())
+
+
+def test_flush_stores_pending_state_after_earlier_saves():
+    async def run():
+        sink = SlowSink(delay=0.05)
+        debouncer = SaveDebouncer(sink, window=0.01)
+        debouncer.submit({"sessionId": "s", "value": 1})
+        await asyncio.sleep(0.02)
+        debouncer.submit({"sessionId": "s", "value": 2})
+
+        await debouncer.flush_session("s")
+        assert [document["value"] for document in sink.stored] == [1, 2]
+
+    asyncio.run(run())
+
+
+def test_write_errors_are_counted_as_failed():
+    async def run():
+        debouncer = SaveDebouncer(SlowSink(fail=[0]), window=10)
+        debouncer.submit({"sessionId": "s"})
+        await debouncer.flush_all()
+        return debouncer.stats()
+
+    stats = asyncio.run(run())
+    assert stats["saved"] == 0 and stats["failed"] == 1
@@ -0,0 +1,106 @@
+import random
+
+import bson
+import numpy as np
+import pytest
+
+import energy_codec
+from energy_codec import (
+    decode_profile, decode_profiles, energy_array, pack_values, stored_energy_centers, unpack_values
+)
+from profile_generator import (
+    CHAKRA_KEYS, ENERGY_FIELDS, RULE_VERSION, energy_centers_to_array, generate_spiritual_profile
+)
+
+
+def _energy_centers(rng):
+    return {key: {field: rng.randint(0, 100) for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}
+
+
+def test_packed_value_round_trips_through_bson():
+    rng = random.Random(1)
+    for _ in range(100):
+        energy_centers = _energy_centers(rng)
+        packed = pack_values(energy_centers_to_array(energy_centers))
+        assert len(packed) == energy_codec.PACKED_SIZE
+
+        stored = bson.decode(bson.encode({"energyCenters": packed}))
+        assert decode_profile(stored)["energyCenters"] == energy_centers
+
+
+def test_both_encodings_read_as_the_same_array():
+    energy_centers = _energy_centers(random.Random(2))
+    values = [energy_centers[key][field] for key in CHAKRA_KEYS for field in ENERGY_FIELDS]
+    np.testing.assert_array_equal(energy_array(energy_centers), energy_array(pack_values(values)))
+
+
+@pytest.mark.parametrize("storage", ["document", "packed"])
+def test_stored_value_decodes_to_the_request_shape(storage, monkeypatch):
+    monkeypatch.setattr(energy_codec, "ENERGY_STORAGE", storage)
+    energy_centers = _energy_centers(random.Random(3))
+    values = [energy_centers[key][field] for key in CHAKRA_KEYS for field in ENERGY_FIELDS]
+    for stored in (stored_energy_centers(values), stored_energy_centers(energy_centers_to_array(energy_centers))):
+        assert decode_profile({"energyCenters": stored})["energyCenters"] == energy_centers
+
+
+@pytest.mark.parametrize("data", [bytes(energy_codec.PACKED_SIZE), b"\x01" + bytes(20), b""])
+def test_unknown_versions_and_lengths_are_rejected(data):
+    with pytest.raises(ValueError):
+        unpack_values(data)
+
+
+def _full_document(rng):
+    energy_centers = _energy_centers(rng)
+    return {
+        "_id": rng.randint(0, 10 ** 9),
+        "sessionId": "session",
+        "energyCenters": energy_centers,
+        "generatedProfile": generate_spiritual_profile(energy_centers),
+        "ruleVersion": RULE_VERSION,
+        "createdAt": rng.randint(0, 10 ** 9)
+    }
+
+
+def _inputs_only(document, packed):
+    stored = {key: value for key, value in document.items() if key != "generatedProfile"}
+    if packed:
+        stored["energyCenters"] = pack_values(energy_centers_to_array(document["energyCenters"]))
+    stored["ruleVersion"] = "0.9"
+    return stored
+
+
+@pytest.mark.parametrize("projection", [
+    None,
+    {"energyCenters": 1, "createdAt": 1},
+    {"generatedProfile.overallLevel": 1, "generatedProfile.healing": 1, "createdAt": 1},
+    {"generatedProfile": 1, "ruleVersion": 1, "createdAt": 1},
+    {"sessionId": 1, "createdAt": 1},
+])
+def test_inputs_only_profiles_decode_like_full_ones(projection):
+    rng = random.Random(4)
+    full = [_full_document(rng) for _ in range(6)]
+    stored = [
+        document if index % 3 == 0 else _inputs_only(document, packed=index % 3 == 2)
+        for index, document in enumerate(full)
+    ]
+
+    def project(document):
+        # What MongoDB returns for the projection the query is sent with
+        fields = energy_codec.read_projection(projection)
+        if fields is None:
+            return dict(document)
+        projected = {"_id": document["_id"]}
+        for key, value in document.items():
+            parts = [path.split(".", 1)[1] for path in fields if path.startswith(f"{key}.")]
+            if key in fields:
+                projected[key] = value
+            elif parts:
+                projected[key] = {part: value[part] for part in parts}
+        return projected
+
+    expected = [project(document) for document in full]
+    if projection is not None and "energyCenters" not in projection:
+        for document in expected:
+            document.pop("energyCenters", None)
+    decoded = decode_profiles([project(document) for document in stored], projection)
+    assert [list(document.items()) for document in decoded] == [list(document.items()) for document in expected]
@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, Request
+
+from fast_ingest import parse_profile_request
+from idempotency import SaveCache
+from profile_generator import CHAKRA_KEYS, ENERGY_FIELDS
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+testclient = pytest.importorskip("fastapi.testclient")
+
+import server  # noqa: E402
+
+
+def _body(value=50, session_id="fast-ingest", **changes):
+    energy_centers = {key: {field: value for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}
+    energy_centers["heart"] = {**energy_centers["heart"], **changes}
+    return {"sessionId": session_id, "energyCenters": energy_centers}
+
+
+# Bodies the fast path must leave to the model, with the reason
+DECLINED = {
+    "float": _body(frequency=50.0),
+    "numeric string": _body(balance="50"),
+    "bool": _body(blockage=True),
+    "above range": _body(frequency=101),
+    "below range": _body(balance=-1),
+    "float out of range": _body(frequency=100.5),
+    "string out of range": _body(balance="101"),
+    "non-numeric string": _body(blockage="high"),
+    "missing field": {"sessionId": "fast-ingest", "energyCenters": {"root": {"frequency": 1}}},
+    "null energyCenters": {"sessionId": "fast-ingest", "energyCenters": None},
+    "numeric sessionId": {**_body(), "sessionId": 7},
+    "list body": [1, 2, 3],
+}
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["fast_ingest_test"])
+    monkeypatch.setattr(server, "save_cache", SaveCache())
+    monkeypatch.setattr(server, "save_debouncer", None)
+    monkeypatch.setattr(server, "write_buffer", None)
+    monkeypatch.setattr(server, "session_rate_limiter", None)
+    return testclient.TestClient(server.app)
+
+
+@pytest.fixture
+def reference():
+    """
+    The same endpoint signature on a plain route, i.e. FastAPI's regular ProfileRequest validation
+    """
+    app = FastAPI()
+
+    @app.post("/api/profiles")
+    async def create_profile(request: server.ProfileRequest, http_request: Request):
+        return {"success": True}
+
+    return testclient.TestClient(app)
+
+
+def _stored(session_id):
+    document = asyncio.run(server.db.energy_profiles.find_one({"sessionId": session_id}))
+    for field in ("_id", "sessionId", "createdAt", "updatedAt", "dedupKey"):
+        document.pop(field, None)
+    return document
+
+
+@pytest.mark.parametrize("name", DECLINED)
+def test_declined_bodies_validate_like_the_model(app, reference, name):
+    body = json.dumps(DECLINED[name]).encode()
+    assert parse_profile_request(body) is None
+
+    response = app.post("/api/profiles", content=body, headers={"Content-Type": "application/json"})
+    expected = reference.post("/api/profiles", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == expected.status_code
+    if expected.status_code == 422:
+        assert response.content == expected.content
+
+
+@pytest.mark.parametrize("body", [b"{not json", b"", b"null", b'{"energyCenters": "x"}'])
+def test_malformed_json_matches_the_model(app, reference, body):
+    assert parse_profile_request(body) is None
+    response = app.post("/api/profiles", content=body, headers={"Content-Type": "application/json"})
+    expected = reference.post("/api/profiles", content=body, headers={"Content-Type": "application/json"})
+    assert (response.status_code, response.content) == (expected.status_code, expected.content)
+
+
+@pytest.mark.parametrize("content_type", ["text/plain", "application/x-www-form-urlencoded", "application/xml"])
+def test_non_json_content_types_fall_through(app, reference, content_type):
+    body = json.dumps(_body()).encode()
+    response = app.post("/api/profiles", content=body, headers={"Content-Type": content_type})
+    expected = reference.post("/api/profiles", content=body, headers={"Content-Type": content_type})
+    assert response.status_code == expected.status_code
+    if expected.status_code == 422:
+        assert response.content == expected.content
+
+
+def test_fast_path_stores_the_same_document_as_the_fallback(app):
+    fast = _body(value=40, session_id="fast", frequency=70)
+    fallback = _body(value=40.0, session_id="fallback", frequency="70")
+    assert parse_profile_request(json.dumps(fast).encode()) is not None
+    assert parse_profile_request(json.dumps(fallback).encode()) is None
+
+    fast_response = app.post("/api/profiles", json=fast)
+    fallback_response = app.post("/api/profiles", json=fallback)
+    assert fast_response.status_code == fallback_response.status_code == 200
+    assert fast_response.json()["profile"] == fallback_response.json()["profile"]
+    assert _stored("fast") == _stored("fallback")
@@ -0,0 +1,73 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+import fast_json
+from fast_json import FastJSONResponse
+from profile_generator import CHAKRA_KEYS, ENERGY_FIELDS, generate_spiritual_profile
+
+
+def _reference_body(content):
+    """
+    How the routes encoded their dicts before FastJSONResponse: jsonable_encoder, then JSONResponse
+    """
+    return JSONResponse(jsonable_encoder(content, custom_encoder={ObjectId: str})).body
+
+
+def _profile_document(rng, created_at):
+    energy_centers = {key: {field: rng.randint(0, 100) for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}
+    return {
+        "_id": ObjectId(),
+        "sessionId": "sessión-ü-✨",
+        "energyCenters": energy_centers,
+        "generatedProfile": generate_spiritual_profile(energy_centers),
+        "ruleVersion": "1.0.0",
+        "createdAt": created_at,
+        "updatedAt": created_at
+    }
+
+
+def _history_page(rng):
+    # Microseconds both present and zero, isoformat drops them when zero
+    created_at = datetime(2024, 1, 1, 12, 0, 0, 123000)
+    return {
+        "success": True,
+        "sessionId": "sessión-ü-✨",
+        "profiles": [
+            _profile_document(rng, created_at - timedelta(minutes=index, microseconds=123000 * (index % 2)))
+            for index in range(50)
+        ],
+        "nextCursor": None
+    }
+
+
+@pytest.fixture(params=[True, False], ids=["orjson", "compat"])
+def encoding(request, monkeypatch):
+    monkeypatch.setattr(fast_json, "ORJSON_RESPONSES", request.param)
+    return request.param
+
+
+def test_history_page_is_byte_equivalent(encoding):
+    page = _history_page(random.Random(1))
+    assert FastJSONResponse(page).body == _reference_body(page)
+
+
+def test_profile_and_stats_responses_are_byte_equivalent(encoding):
+    document = _profile_document(random.Random(2), datetime(2024, 6, 30, 23, 59, 59))
+    for content in (
+        {"success": True, "profile": document},
+        {"success": True, "stats": {"profileCount": 3, "firstVisit": datetime(2024, 1, 1), "lastVisit": None}},
+        {"success": True, "stats": {"profileCount": 0, "firstVisit": None}},
+        {"detail": "Profile not found"},
+        {"text": "quotes \" backslash \\ control \x1f line separator \u2028 emoji \U0001f64f"},
+    ):
+        assert FastJSONResponse(content).body == _reference_body(content)
+
+
+def test_unsupported_types_are_rejected():
+    with pytest.raises(TypeError):
+        FastJSONResponse({"value": object()})
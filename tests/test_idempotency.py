@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from debounce import SaveDebouncer
+from idempotency import SaveCache
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+testclient = pytest.importorskip("fastapi.testclient")
+
+import server  # noqa: E402
+from profile_generator import CHAKRA_KEYS  # noqa: E402
+
+
+def _energy_centers(root_frequency):
+    return {
+        key: {"frequency": root_frequency if key == "root" else 50, "balance": 50, "blockage": 20}
+        for key in CHAKRA_KEYS
+    }
+
+
+@pytest.fixture
+def debounced_app(monkeypatch):
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["idempotency_test"])
+    monkeypatch.setattr(server, "save_cache", SaveCache())
+    monkeypatch.setattr(server, "save_debouncer", SaveDebouncer(server._store_settled_profiles, window=0.2))
+    return testclient.TestClient(server.app)
+
+
+@pytest.fixture
+def direct_app(monkeypatch):
+    monkeypatch.setattr(server, "db", mongomock_motor.AsyncMongoMockClient()["idempotency_test"])
+    monkeypatch.setattr(server, "save_cache", SaveCache(window=300))
+    monkeypatch.setattr(server, "save_debouncer", None)
+    monkeypatch.setattr(server, "write_buffer", None)
+    return testclient.TestClient(server.app)
+
+
+def _save(app, root_frequency, session_id="session-a"):
+    response = app.post("/api/profiles", json={"sessionId": session_id, "energyCenters": _energy_centers(root_frequency)})
+    assert response.status_code == 200
+    return response.json()["profileId"]
+
+
+def test_direct_writes_only_dedup_consecutive_repeats(direct_app):
+    first, second, third = (_save(direct_app, root_frequency) for root_frequency in (10, 20, 10))
+    assert len({first, second, third}) == 3
+
+    # Repeats of the latest values, also after another session saved, return that save
+    _save(direct_app, 30, session_id="session-b")
+    assert _save(direct_app, 10) == third
+
+    history = direct_app.get("/api/profiles/session-a").json()["profiles"]
+    assert [profile["energyCenters"]["root"]["frequency"] for profile in history] == [10, 20, 10]
+
+    dedup_keys = asyncio.run(server.db.energy_profiles.distinct("dedupKey", {"sessionId": "session-a"}))
+    assert len(dedup_keys) == 3
+
+
+def test_repeated_values_replace_a_pending_debounced_state(debounced_app):
+    profile_ids = [_save(debounced_app, root_frequency) for root_frequency in (10, 20, 10)]
+    assert len(set(profile_ids)) == 1
+
+    history = debounced_app.get("/api/profiles/session-a").json()["profiles"]
+    assert [profile["energyCenters"]["root"]["frequency"] for profile in history] == [10]
+
+    stored = asyncio.run(server.db.energy_profiles.count_documents({}))
+    assert stored == 1
@@ -0,0 +1,70 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from profile_generator import (
+    CHAKRA_KEYS, ENERGY_FIELDS, RULE_VERSION, analyze_energy_centers, analyze_energy_values, energy_centers_to_array,
+    energy_centers_to_values, generate_spiritual_profile, generate_spiritual_profiles, lookup_profile,
+    lookup_profile_values
+)
+from tests.baseline_profile_generator import generate_spiritual_profile as baseline_profile
+
+pytestmark = pytest.mark.skipif(RULE_VERSION != "1.0.0", reason="the frozen baseline implements rule set 1.0.0")
+
+# Every threshold of the rule set, one either side of it and the ends of the range
+BOUNDARY_VALUES = (0, 1, 39, 40, 41, 49, 50, 51, 59, 60, 61, 69, 70, 71, 79, 80, 81, 99, 100)
+
+
+def _uniform(value):
+    return {key: {field: value for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}
+
+
+def _inputs():
+    rng = random.Random(7)
+    inputs = [_uniform(value) for value in BOUNDARY_VALUES]
+    inputs += [
+        {key: {field: rng.randint(0, 100) for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}
+        for _ in range(2000)
+    ]
+    inputs += [
+        {key: {field: rng.choice(BOUNDARY_VALUES) for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}
+        for _ in range(2000)
+    ]
+    # Ties between chakras on the dominant score and on blockage
+    for frequency, balance, blockage in itertools.product((0, 50, 100), repeat=3):
+        centers = _uniform(0)
+        for key in ("sacral", "heart", "crown"):
+            centers[key] = {"frequency": frequency, "balance": balance, "blockage": blockage}
+        inputs.append(centers)
+    # Levels that land exactly on a threshold: (frequency + balance - blockage) / 2 == 40, 60, 80
+    for level in (40, 60, 80):
+        inputs.append({key: {"frequency": level, "balance": level, "blockage": 0} for key in CHAKRA_KEYS})
+    return inputs
+
+
+INPUTS = _inputs()
+
+
+def test_scalar_generator_matches_baseline():
+    for energy_centers in INPUTS:
+        assert generate_spiritual_profile(energy_centers) == baseline_profile(energy_centers), energy_centers
+
+
+def test_batch_generator_matches_baseline():
+    profiles = generate_spiritual_profiles(np.stack([energy_centers_to_array(centers) for centers in INPUTS]))
+    assert profiles == [baseline_profile(energy_centers) for energy_centers in INPUTS]
+
+
+def test_cached_lookups_match_baseline():
+    for energy_centers in INPUTS[:500]:
+        expected = baseline_profile(energy_centers)
+        assert lookup_profile(energy_centers)[0] == expected
+        assert lookup_profile_values(energy_centers_to_values(energy_centers))[0] == expected
+
+
+def test_single_row_features_match_array_path():
+    features = analyze_energy_centers(np.stack([energy_centers_to_array(centers) for centers in INPUTS]))
+    rows = list(zip(*(column.tolist() for column in features)))
+    assert [analyze_energy_values(energy_centers_to_values(centers)) for centers in INPUTS] == rows
@@ -0,0 +1,118 @@
+import random
+
+import pytest
+
+from profile_generator import CHAKRA_KEYS, ENERGY_FIELDS, analyze_energy_values, energy_centers_to_values
+from trends import SERIES, session_trend_fields
+
+
+def _profile(session_id, rng):
+    return {
+        "sessionId": session_id,
+        "energyCenters": {key: {field: rng.randint(0, 100) for field in ENERGY_FIELDS} for key in CHAKRA_KEYS}
+    }
+
+
+def _series(profile):
+    values = energy_centers_to_values(profile["energyCenters"])
+    return [*values, analyze_energy_values(values)[0]]
+
+
+def _evaluate(expression, session):
+    """
+    The value of an update pipeline expression, as MongoDB evaluates it against `session`
+    """
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = session
+        for part in expression[1:].split("."):
+            value = (value or {}).get(part)
+        return value
+    if not isinstance(expression, dict):
+        return expression
+    (operator, arguments), = expression.items()
+    arguments = [_evaluate(argument, session) for argument in arguments]
+    if operator == "$ifNull":
+        return arguments[0] if arguments[0] is not None else arguments[1]
+    if operator == "$add":
+        return sum(arguments)
+    if operator == "$multiply":
+        return arguments[0] * arguments[1]
+    return {"$min": min, "$max": max}[operator](arguments)
+
+
+def _apply(session, fields):
+    """
+    The session document after a $set stage with `fields`; every expression sees the document before it
+    """
+    updated = {}
+    for path, expression in fields.items():
+        parent = updated
+        parts = path.split(".")
+        for part in parts[:-1]:
+            parent = parent.setdefault(part, {})
+        parent[parts[-1]] = _evaluate(expression, session)
+    return updated
+
+
+def _stored(session, series):
+    value = session["trends"]
+    for part in series.split("."):
+        value = value[part]
+    return value
+
+
+def _sequential(rows, alpha):
+    """
+    The trends by their definition, one profile at a time
+    """
+    expected = {}
+    for position, series in enumerate(SERIES):
+        values = [row[position] for row in rows]
+        ewma = values[0]
+        for value in values:
+            ewma = (1 - alpha) * ewma + alpha * value
+        expected[series] = {
+            "sum": sum(values), "min": min(values), "max": max(values), "last": values[-1], "ewma": ewma
+        }
+    return expected
+
+
+def _assert_trends(session, rows, alpha):
+    assert session["trends"]["count"] == len(rows)
+    for series, expected in _sequential(rows, alpha).items():
+        stored = _stored(session, series)
+        assert {field: stored[field] for field in ("sum", "min", "max", "last")} == {
+            field: expected[field] for field in ("sum", "min", "max", "last")
+        }, series
+        assert stored["ewma"] == pytest.approx(expected["ewma"]), series
+
+
+@pytest.mark.parametrize("batches", [[1, 1, 1, 1, 1], [5], [2, 3], [1, 4], [3, 1, 1]])
+def test_ewma_fold_matches_sequential_definition(batches):
+    rng = random.Random(11)
+    alpha = 0.3
+    sessions = {"a": None, "b": None}
+    saved = {"a": [], "b": []}
+    for size in batches:
+        # Both sessions interleaved in one bulk write
+        documents = [_profile(session_id, rng) for _ in range(size) for session_id in ("a", "b")]
+        for session_id, fields in session_trend_fields(documents, alpha).items():
+            sessions[session_id] = _apply(sessions[session_id], fields)
+        for document in documents:
+            saved[document["sessionId"]].append(_series(document))
+
+    for session_id, session in sessions.items():
+        _assert_trends(session, saved[session_id], alpha)
+
+
+def test_new_session_is_seeded_with_its_first_profile():
+    rng = random.Random(3)
+    for documents in ([_profile("new", rng)], [_profile("new", rng), _profile("other", rng)]):
+        session = _apply(None, session_trend_fields(documents, 0.3)["new"])
+        row = _series(documents[0])
+        for position, series in enumerate(SERIES):
+            value = row[position]
+            assert _stored(session, series) == {
+                "sum": value, "min": value, "max": value, "last": value, "ewma": pytest.approx(value)
+            }, series
+        assert session["trends"]["count"] == 1